@@ -16,6 +16,7 @@ st.set_page_config(
 )
 
 from tools import homepage, step1_data_preparation, step2_shoreline_detection, step3_stats, step4_animation, step5_scanline_detection, step6_rgb_shoreline, step0_demo_data
+from tools import las_cache
 
 # === Sidebar ===
 with st.sidebar:
@@ -38,6 +39,12 @@ step = st.sidebar.radio("Select page", [
     "Demo data"
 ], key="step_selector")
 
+cache_mb = st.sidebar.number_input(
+    "LAS cache memory [MB]", min_value=0, value=las_cache.DEFAULT_MEMORY_BUDGET_MB, step=256,
+    help="Point clouds are read from a per-file column store (input/**/.columns) when the folder is writable. Otherwise decoded points are kept in memory between pages and reruns, and the least recently used files are dropped first."
+)
+las_cache.set_memory_budget(cache_mb)
+
 # === Main ===
 st.title("S-LiNE Toolbox")
 
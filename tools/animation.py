@@ -0,0 +1,176 @@
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgb
+from PIL import Image, GifImagePlugin
+
+try:
+    import imageio.v2 as imageio
+    import imageio_ffmpeg  # provides the ffmpeg binary used by imageio
+except ImportError:
+    imageio = None
+
+MAX_PALETTE_LEVELS = 16
+# Last palette entry, never used by a colour, marks pixels unchanged since the previous frame
+TRANSPARENT_INDEX = 255
+
+# Optional video outputs (imageio with imageio-ffmpeg): file extension -> ffmpeg codec
+VIDEO_CODECS = {"mp4": "libx264", "webm": "libvpx-vp9"}
+
+
+def shared_palette(colors):
+    # One GIF palette for all frames: every line colour, and black for text and axes,
+    # blended with the white background in equal steps to cover antialiased edges
+    bases = [to_rgb(c) for c in colors] + [(0.0, 0.0, 0.0)]
+    levels = max(2, min(MAX_PALETTE_LEVELS, TRANSPARENT_INDEX // len(bases)))
+    alpha = np.linspace(0.0, 1.0, levels)[:, None]
+    entries = np.concatenate([1.0 - alpha * (1.0 - np.array(base)) for base in bases])
+    entries = np.unique(np.round(entries * 255).astype(np.uint8), axis=0)[:TRANSPARENT_INDEX]
+
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(entries.ravel().tolist() + [255, 255, 255] * (256 - len(entries)))
+    return palette
+
+
+class AnimationRenderer:
+    # Keeps one figure for the whole animation. Each frame draws only the new shoreline
+    # on top of the previous frame's pixels, then the legend, so rendering N frames
+    # draws N lines instead of N^2 / 2.
+    def __init__(self, extent, dpi, line_width, figsize=(10, 6)):
+        xmin, xmax, ymin, ymax = extent
+        self.line_width = line_width
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_xlim(xmin, xmax)
+        self.ax.set_ylim(ymin, ymax)
+        self.ax.set_autoscale_on(False)
+        self.ax.set_title("Shoreline evolution")
+        self.ax.set_xlabel("X [m]")
+        self.ax.set_ylabel("Y [m]")
+        self.ax.set_aspect("equal")
+        self.fig.tight_layout()
+
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+    def add(self, line, color, label):
+        # Returns the next frame as an RGB array
+        self.canvas.restore_region(self.background)
+        coords = np.asarray(line.coords)
+        artist, = self.ax.plot(coords[:, 0], coords[:, 1], color=color, linewidth=self.line_width, label=label)
+        self.ax.draw_artist(artist)
+        for spine in self.ax.spines.values():
+            self.ax.draw_artist(spine)
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+
+        self.ax.draw_artist(self.ax.legend(loc="upper left"))
+        return np.asarray(self.canvas.buffer_rgba())[..., :3].copy()
+
+
+def quantize_frame(frame, palette):
+    return Image.fromarray(frame).quantize(palette=palette, dither=Image.Dither.NONE)
+
+
+def encode_gif_frame(frame, previous, palette, duration_ms):
+    # Quantised and LZW-encoded GIF image block of one frame. Only the rectangle that
+    # changed since the previous frame is stored, with unchanged pixels in it transparent.
+    image = quantize_frame(frame, palette)
+    if previous is None:
+        return b"".join(GifImagePlugin.getdata(image, (0, 0), duration=duration_ms))
+
+    changed = np.any(frame != previous, axis=2)
+    rows = np.flatnonzero(changed.any(axis=1))
+    cols = np.flatnonzero(changed.any(axis=0))
+    if len(rows) == 0:
+        rows = cols = np.array([0])
+    top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+    indices = np.asarray(image)[top:bottom, left:right].copy()
+    indices[~changed[top:bottom, left:right]] = TRANSPARENT_INDEX
+    block = Image.fromarray(indices)
+    block.putpalette(palette.getpalette())
+    return b"".join(GifImagePlugin.getdata(
+        block, (int(left), int(top)), duration=duration_ms, transparency=TRANSPARENT_INDEX
+    ))
+
+
+class GifWriter:
+    # Looping GIF with one global palette shared by all frames, written block by block
+    def __init__(self, path, size, palette, loop=0):
+        self.file = open(path, "wb")
+        width, height = size
+        self.file.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0xF7, 0, 0))
+        self.file.write(bytes(palette.getpalette()[:768]))
+        self.file.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+    def write(self, encoded_frame):
+        self.file.write(encoded_frame)
+
+    def close(self):
+        self.file.write(b";")
+        self.file.close()
+
+
+def _bounded_map(pool, function, items, in_flight):
+    # Like pool.map, in order, but pulls at most `in_flight` items ahead of the results
+    # instead of consuming the whole iterator up front
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(function, item))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def save_gif(gif_path, frames, palette, duration_ms, workers=None):
+    # Frames are encoded in a thread pool (Pillow releases the GIL while quantising and
+    # LZW-encoding), overlapping with the rendering of the next frames in the calling thread.
+    # Each block is written as soon as it is ready, so only a few frames are held at a time.
+    workers = workers or os.cpu_count() or 1
+    previous = [None]
+
+    def with_previous(frame):
+        pair = (frame, previous[0])
+        previous[0] = frame
+        return pair
+
+    writer = None
+    count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pairs = (with_previous(frame) for frame in frames)
+        encode = lambda pair: (pair[0].shape, encode_gif_frame(*pair, palette, duration_ms))
+        for shape, encoded in _bounded_map(pool, encode, pairs, 2 * workers):
+            if writer is None:
+                writer = GifWriter(gif_path, (shape[1], shape[0]), palette)
+            writer.write(encoded)
+            count += 1
+    if writer is not None:
+        writer.close()
+    return count
+
+
+def video_available():
+    return imageio is not None
+
+
+def save_video(video_path, frames, duration_ms):
+    # MP4 or WebM by file extension; frames are piped to ffmpeg one at a time
+    codec = VIDEO_CODECS[os.path.splitext(video_path)[1].lstrip(".").lower()]
+    writer = imageio.get_writer(
+        video_path, format="FFMPEG", fps=1000 / duration_ms, codec=codec,
+        macro_block_size=16, ffmpeg_log_level="error",
+    )
+    count = 0
+    try:
+        for frame in frames:
+            writer.append_data(frame)
+            count += 1
+    finally:
+        writer.close()
+    return count
@@ -0,0 +1,181 @@
+import os
+import numpy as np
+from tools.las_cache import load_las, column_store_path
+
+COLOR_BITS = 6              # 64 levels per 16-bit channel, 1024 values wide
+Z_STEP = 0.05
+SPATIAL_COLOR_SHIFT = 2     # spatial index: 16 levels per channel
+SPATIAL_Z_FACTOR = 4        # spatial index: 0.2 m height bins
+CELL_SIZE = 1.0
+MAX_CELLS_PER_AXIS = 1000
+CHUNK_SIZE = 5_000_000
+CUBE_FILE = "rgbz_cube.npz"
+
+LEVELS = 1 << COLOR_BITS
+COLOR_STEP = 65536 // LEVELS
+
+# Cubes of the files used in this app process, by (path, mtime_ns, size)
+_cubes = {}
+
+
+def _unique_counts(codes_per_chunk):
+    codes, inverse = np.unique(np.concatenate([c for c, _ in codes_per_chunk]), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([n for _, n in codes_per_chunk]))
+    return codes, counts.astype(np.int64)
+
+
+def _channel_weights(lo, hi, levels, step):
+    # Share of every quantisation bin [q*step, (q+1)*step - 1] inside the inclusive range [lo, hi]
+    bottom = np.arange(levels) * step
+    overlap = np.minimum(hi, bottom + step - 1) - np.maximum(lo, bottom) + 1
+    return np.clip(overlap, 0, step) / step
+
+
+def _z_weights(lo, hi, z0, levels, step):
+    bottom = z0 + np.arange(levels) * step
+    overlap = np.minimum(hi, bottom + step) - np.maximum(lo, bottom)
+    return np.clip(overlap, 0, step) / step
+
+
+class ColorCube:
+    # Sparse joint histogram of quantised (Z, R, G, B) plus, per spatial cell, the set of
+    # coarser (Z, R, G, B) bins present in it. Filter counts, channel histograms and coverage
+    # maps are evaluated on the occupied bins only, independent of the number of points.
+    def __init__(self, codes, counts, cell_codes, z0, nz, grid_shape, extent):
+        self.z0, self.nz = z0, nz
+        self.grid_shape = tuple(grid_shape)
+        self.extent = tuple(extent)
+        self.counts = counts
+        self.total = int(counts.sum())
+        self.codes, self.cell_codes = codes, cell_codes
+
+        rest, self.b = np.divmod(codes, LEVELS)
+        rest, self.g = np.divmod(rest, LEVELS)
+        self.z, self.r = np.divmod(rest, LEVELS)
+
+        levels = LEVELS >> SPATIAL_COLOR_SHIFT
+        self.spatial_nz = -(-nz // SPATIAL_Z_FACTOR)
+        rest, self.cell_b = np.divmod(cell_codes, levels)
+        rest, self.cell_g = np.divmod(rest, levels)
+        rest, self.cell_r = np.divmod(rest, levels)
+        self.cell, self.cell_z = np.divmod(rest, self.spatial_nz)
+
+    def _weights(self, red, green, blue, z):
+        return (
+            _channel_weights(*red, LEVELS, COLOR_STEP)[self.r] *
+            _channel_weights(*green, LEVELS, COLOR_STEP)[self.g] *
+            _channel_weights(*blue, LEVELS, COLOR_STEP)[self.b] *
+            _z_weights(*z, self.z0, self.nz, Z_STEP)[self.z]
+        )
+
+    def count(self, red, green, blue, z):
+        # Bins on the range limits count with the share of their width inside the range
+        return float(np.sum(self.counts * self._weights(red, green, blue, z)))
+
+    def channel_histograms(self, z):
+        # Per-channel histograms of the points inside the height range, bin edges in colour units
+        weights = self.counts * _z_weights(*z, self.z0, self.nz, Z_STEP)[self.z]
+        edges = np.arange(LEVELS + 1) * COLOR_STEP
+        return edges, {
+            name: np.bincount(q, weights=weights, minlength=LEVELS)
+            for name, q in (("red", self.r), ("green", self.g), ("blue", self.b))
+        }
+
+    def coverage(self, red, green, blue, z):
+        # Grid of 0 = no points, 1 = points, 2 = points passing the filter
+        levels = LEVELS >> SPATIAL_COLOR_SHIFT
+        step = COLOR_STEP << SPATIAL_COLOR_SHIFT
+        weights = (
+            _channel_weights(*red, levels, step)[self.cell_r] *
+            _channel_weights(*green, levels, step)[self.cell_g] *
+            _channel_weights(*blue, levels, step)[self.cell_b] *
+            _z_weights(*z, self.z0, self.spatial_nz, Z_STEP * SPATIAL_Z_FACTOR)[self.cell_z]
+        )
+        size = self.grid_shape[0] * self.grid_shape[1]
+        grid = np.zeros(size, dtype=np.uint8)
+        grid[self.cell] = 1
+        grid[self.cell[weights >= 0.5]] = 2
+        return grid.reshape(self.grid_shape)
+
+
+def build_color_cube(path, chunk_size=CHUNK_SIZE):
+    las = load_las(path, ("x", "y", "z", "red", "green", "blue"))
+    if "red" not in las:
+        return None
+    x, y, z = las["x"], las["y"], las["z"]
+
+    xmin, xmax, ymin, ymax = float(x.min()), float(x.max()), float(y.min()), float(y.max())
+    cell = max(CELL_SIZE, (xmax - xmin) / MAX_CELLS_PER_AXIS, (ymax - ymin) / MAX_CELLS_PER_AXIS)
+    nx = max(1, int(np.ceil((xmax - xmin) / cell)))
+    ny = max(1, int(np.ceil((ymax - ymin) / cell)))
+    z0 = float(np.floor(z.min()))
+    nz = int((z.max() - z0) // Z_STEP) + 1
+    spatial_levels = LEVELS >> SPATIAL_COLOR_SHIFT
+    spatial_nz = -(-nz // SPATIAL_Z_FACTOR)
+
+    shift = 16 - COLOR_BITS
+    fine, spatial = [], []
+    for start in range(0, len(z), chunk_size):
+        part = slice(start, start + chunk_size)
+        r = np.asarray(las["red"][part], dtype=np.int64) >> shift
+        g = np.asarray(las["green"][part], dtype=np.int64) >> shift
+        b = np.asarray(las["blue"][part], dtype=np.int64) >> shift
+        zq = ((z[part] - z0) // Z_STEP).astype(np.int64)
+
+        codes, counts = np.unique(((zq * LEVELS + r) * LEVELS + g) * LEVELS + b, return_counts=True)
+        fine.append((codes, counts))
+
+        ix = np.minimum(((x[part] - xmin) / cell).astype(np.int64), nx - 1)
+        iy = np.minimum(((y[part] - ymin) / cell).astype(np.int64), ny - 1)
+        cell_codes = (ix * ny + iy) * spatial_nz + zq // SPATIAL_Z_FACTOR
+        for q in (r, g, b):
+            cell_codes = cell_codes * spatial_levels + (q >> SPATIAL_COLOR_SHIFT)
+        spatial.append(np.unique(cell_codes))
+
+    codes, counts = _unique_counts(fine)
+    cell_codes = np.unique(np.concatenate(spatial))
+    extent = (xmin, xmin + nx * cell, ymin, ymin + ny * cell)
+    return ColorCube(codes, counts, cell_codes, z0, nz, (nx, ny), extent)
+
+
+def _cube_file(path):
+    return os.path.join(column_store_path(path), CUBE_FILE)
+
+
+def _save(cube, path, stat):
+    try:
+        np.savez(
+            _cube_file(path), codes=cube.codes, counts=cube.counts, cell_codes=cube.cell_codes,
+            meta=np.array([stat.st_mtime_ns, stat.st_size, cube.nz, *cube.grid_shape]),
+            geometry=np.array([cube.z0, *cube.extent]),
+        )
+    except OSError:
+        pass
+
+
+def _load(path, stat):
+    try:
+        with np.load(_cube_file(path)) as data:
+            mtime_ns, size, nz, nx, ny = data["meta"].tolist()
+            if mtime_ns != stat.st_mtime_ns or size != stat.st_size:
+                return None
+            z0, *extent = data["geometry"].tolist()
+            return ColorCube(data["codes"], data["counts"], data["cell_codes"], z0, nz, (nx, ny), extent)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_color_cube(path):
+    # Built once per LAS file and kept next to its column store; None for files without RGB
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _cubes:
+        cube = _load(path, stat)
+        if cube is None:
+            cube = build_color_cube(path)
+            if cube is not None:
+                _save(cube, path, stat)
+        for stale in [k for k in _cubes if k[0] == key[0]]:
+            del _cubes[stale]
+        _cubes[key] = cube
+    return _cubes[key]
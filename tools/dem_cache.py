@@ -0,0 +1,64 @@
+import os
+import json
+import numpy as np
+from tools.las_cache import load_las
+from tools.raster import PointGrid
+
+DEM_CACHE_DIR = ".dem"
+
+
+def dem_path(las_path, cell_size):
+    # input/las_geoid/.dem/<file name>/dem_<cell size>m.npy, with a .json header next to it
+    folder = os.path.join(os.path.dirname(os.path.abspath(las_path)), DEM_CACHE_DIR, os.path.basename(las_path))
+    return os.path.join(folder, f"dem_{cell_size:g}m.npy")
+
+
+def _read_header(path):
+    try:
+        with open(path.replace(".npy", ".json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_dem(las_path, cell_size):
+    # Mean-Z grid with the layout used by the detection steps: int(extent / cell size) bins
+    # between the data bounds
+    las = load_las(las_path, ("x", "y", "z"))
+    x, y, z = las["x"], las["y"], las["z"]
+    nxb = int((x.max() - x.min()) / cell_size)
+    nyb = int((y.max() - y.min()) / cell_size)
+    grid = PointGrid(x, y, bins=[nxb, nyb])
+    xmin, xmax, ymin, ymax = (float(v) for v in grid.extent)
+    header = {
+        "geotransform": [xmin, float(grid.x_edge[1] - grid.x_edge[0]), 0.0, ymin, 0.0, float(grid.y_edge[1] - grid.y_edge[0])],
+        "extent": [xmin, xmax, ymin, ymax],
+        "shape": list(grid.shape),
+        "cell_size": cell_size,
+    }
+    return grid.mean(z).astype(np.float32), header
+
+
+def save_dem(dem, header, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path + ".tmp.npy", dem)
+    os.replace(path + ".tmp.npy", path)
+    with open(path.replace(".npy", ".json"), "w") as f:
+        json.dump(header, f)
+
+
+def load_dem(las_path, cell_size):
+    # Returns (dem, extent); the DEM is memory-mapped from the cache, which is rebuilt when the LAS changed.
+    # dem[i, j] is the mean Z of column i (x) and row j (y), NaN for empty cells.
+    path = dem_path(las_path, cell_size)
+    stat = os.stat(las_path)
+    header = _read_header(path)
+    if header is None or header["mtime_ns"] != stat.st_mtime_ns or header["size"] != stat.st_size or not os.path.exists(path):
+        dem, header = build_dem(las_path, cell_size)
+        header.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        try:
+            save_dem(dem, header, path)
+        except OSError:
+            # Read-only input folder: use the DEM without caching it
+            return dem, tuple(header["extent"])
+    return np.load(path, mmap_mode="r"), tuple(header["extent"])
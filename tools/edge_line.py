@@ -0,0 +1,28 @@
+import numpy as np
+
+
+def edge_points_per_bin(points, resolution=1.0, mode='upper'):
+    # Point with the highest (mode='upper') or lowest y in every x-bin, in bin order.
+    # Sorting once makes the bins contiguous, so each bin is reduced in a single pass
+    # instead of masking the whole array per bin.
+    x, y = points[:, 0], points[:, 1]
+    if len(x) == 0:
+        return np.empty((0, 2))
+
+    bins = np.round(x / resolution) * resolution
+    idx_sort = np.argsort(x)
+    x_sorted = x[idx_sort]
+    y_sorted = y[idx_sort]
+    bins_sorted = bins[idx_sort]
+
+    starts = np.flatnonzero(np.r_[True, bins_sorted[1:] != bins_sorted[:-1]])
+    counts = np.diff(np.r_[starts, len(x)])
+
+    reduce = np.maximum if mode == 'upper' else np.minimum
+    extreme = reduce.reduceat(y_sorted, starts)
+
+    # First point reaching the extreme in each bin, like np.argmax / np.argmin
+    candidates = np.where(y_sorted == np.repeat(extreme, counts), np.arange(len(x)), len(x))
+    first = np.minimum.reduceat(candidates, starts)
+
+    return np.column_stack((x_sorted[first], y_sorted[first]))
@@ -0,0 +1,220 @@
+import os
+import json
+import hashlib
+import pickle
+import numpy as np
+import pandas as pd
+import laspy
+from scipy.interpolate import LinearNDInterpolator
+from scipy.spatial import QhullError
+
+GEOID_CACHE_DIR = "input/geoid/.cache"
+DEFAULT_MARGIN = 1000.0
+
+# In-process caches, shared by every Streamlit rerun of the same session
+_hashes = {}
+_interpolators = {}
+
+
+def file_hash(path, block_size=1 << 20):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if memo_key in _hashes:
+        return _hashes[memo_key]
+
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+
+    _hashes[memo_key] = h.hexdigest()
+    return _hashes[memo_key]
+
+
+def las_bounds(las_paths):
+    # Only the headers are read, no points
+    mins, maxs = [], []
+    for path in las_paths:
+        with laspy.open(path) as reader:
+            mins.append(reader.header.mins[:2])
+            maxs.append(reader.header.maxs[:2])
+    xmin, ymin = np.min(mins, axis=0)
+    xmax, ymax = np.max(maxs, axis=0)
+    return xmin, ymin, xmax, ymax
+
+
+def crop_window(bounds, margin=DEFAULT_MARGIN):
+    # Snapped to the margin grid, so flights over the same area share one cache entry
+    xmin, ymin, xmax, ymax = bounds
+    return (
+        np.floor((xmin - margin) / margin) * margin,
+        np.floor((ymin - margin) / margin) * margin,
+        np.ceil((xmax + margin) / margin) * margin,
+        np.ceil((ymax + margin) / margin) * margin,
+    )
+
+
+class GeoidGrid:
+    # Regular geoid grid with O(1) bilinear lookup; values outside the grid are NaN,
+    # like the linear interpolator outside the convex hull
+    def __init__(self, grid, x0, y0, dx, dy):
+        self.grid = grid
+        self.x0, self.y0 = x0, y0
+        self.dx, self.dy = dx, dy
+
+    def __call__(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ny, nx = self.grid.shape
+        fx = (x - self.x0) / self.dx
+        fy = (y - self.y0) / self.dy
+
+        result = np.full(x.shape, np.nan)
+        inside = (fx >= 0) & (fx <= nx - 1) & (fy >= 0) & (fy <= ny - 1)
+        fx, fy = fx[inside], fy[inside]
+
+        ix = np.minimum(fx.astype(np.int64), nx - 2)
+        iy = np.minimum(fy.astype(np.int64), ny - 2)
+        tx = fx - ix
+        ty = fy - iy
+
+        g = self.grid
+        result[inside] = (
+            g[iy, ix] * (1 - tx) * (1 - ty) +
+            g[iy, ix + 1] * tx * (1 - ty) +
+            g[iy + 1, ix] * (1 - tx) * ty +
+            g[iy + 1, ix + 1] * tx * ty
+        )
+        return result
+
+
+def detect_regular_grid(x, y):
+    xs = np.unique(x)
+    ys = np.unique(y)
+    if len(xs) < 2 or len(ys) < 2 or len(xs) * len(ys) != len(x):
+        return None
+
+    dx, dy = np.diff(xs), np.diff(ys)
+    if not (np.allclose(dx, dx[0], rtol=0, atol=1e-3 * dx[0]) and np.allclose(dy, dy[0], rtol=0, atol=1e-3 * dy[0])):
+        return None
+
+    return xs[0], ys[0], (xs[-1] - xs[0]) / (len(xs) - 1), (ys[-1] - ys[0]) / (len(ys) - 1), len(xs), len(ys)
+
+
+def geoid_grid_from_df(geoid_df):
+    x_geo = geoid_df['x'].values
+    y_geo = geoid_df['y'].values
+    layout = detect_regular_grid(x_geo, y_geo)
+    if layout is None:
+        return None
+
+    x0, y0, dx, dy, nx, ny = layout
+    ix = np.rint((x_geo - x0) / dx).astype(np.int64)
+    iy = np.rint((y_geo - y0) / dy).astype(np.int64)
+    grid = np.full((ny, nx), np.nan, dtype=np.float32)
+    grid[iy, ix] = geoid_df['geoid'].values
+    return GeoidGrid(grid, x0, y0, dx, dy)
+
+
+def save_geoid_grid(geoid_grid, grid_path):
+    header = {
+        "x0": float(geoid_grid.x0), "y0": float(geoid_grid.y0),
+        "dx": float(geoid_grid.dx), "dy": float(geoid_grid.dy),
+        "shape": list(geoid_grid.grid.shape),
+    }
+    np.save(grid_path + ".tmp.npy", geoid_grid.grid)
+    os.replace(grid_path + ".tmp.npy", grid_path)
+    with open(grid_path.replace(".npy", ".json"), "w") as f:
+        json.dump(header, f)
+
+
+def open_geoid_grid(grid_path):
+    with open(grid_path.replace(".npy", ".json")) as f:
+        header = json.load(f)
+    grid = np.load(grid_path, mmap_mode="r")
+    return GeoidGrid(grid, header["x0"], header["y0"], header["dx"], header["dy"])
+
+
+def covers(interpolator, window):
+    # True when the interpolator's triangulation contains the whole window
+    xmin, ymin, xmax, ymax = window
+    corners = np.array([[xmin, ymin], [xmin, ymax], [xmax, ymin], [xmax, ymax]])
+    return bool(np.all(interpolator.tri.find_simplex(corners) >= 0))
+
+
+def build_geoid_interpolator(geoid_df, window=None):
+    points = np.column_stack((geoid_df['x'].values, geoid_df['y'].values))
+    geoid_vals = geoid_df['geoid'].values
+    if window is None:
+        return LinearNDInterpolator(points, geoid_vals)
+
+    # The cropped points must enclose the whole window, otherwise LAS points near its edge
+    # interpolate to NaN. Sparse models need a wider crop: the window grows by doubling steps
+    # until the hull of the cropped points contains its corners, up to the full model.
+    xmin, ymin, xmax, ymax = window
+    grow = 0.0
+    while True:
+        mask = (
+            (points[:, 0] >= xmin - grow) & (points[:, 0] <= xmax + grow) &
+            (points[:, 1] >= ymin - grow) & (points[:, 1] <= ymax + grow)
+        )
+        if mask.all():
+            return LinearNDInterpolator(points, geoid_vals)
+        if np.count_nonzero(mask) >= 3:
+            try:
+                interpolator = LinearNDInterpolator(points[mask], geoid_vals[mask])
+            except QhullError:
+                interpolator = None
+            if interpolator is not None and covers(interpolator, window):
+                return interpolator
+        grow = grow * 2 if grow else DEFAULT_MARGIN
+
+
+def load_geoid_interpolator(geoid_path, bounds=None, margin=DEFAULT_MARGIN):
+    csv_key = file_hash(geoid_path)
+    if csv_key in _interpolators:
+        return _interpolators[csv_key]
+
+    # Regular grids are converted once to a memory-mapped .npy, no CSV parsing or triangulation afterwards
+    grid_path = os.path.join(GEOID_CACHE_DIR, csv_key + "_grid.npy")
+    if os.path.exists(grid_path) and os.path.exists(grid_path.replace(".npy", ".json")):
+        _interpolators[csv_key] = open_geoid_grid(grid_path)
+        return _interpolators[csv_key]
+
+    key = csv_key
+    window = None
+    if bounds is not None:
+        window = crop_window(bounds, margin)
+        # "hull": crops grown until they enclose the window; earlier crops are not reused
+        key += "_hull_" + "_".join(str(int(v)) for v in window)
+
+    if key in _interpolators:
+        return _interpolators[key]
+
+    cache_path = os.path.join(GEOID_CACHE_DIR, key + ".pkl")
+    interpolator = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                interpolator = pickle.load(f)
+        except Exception:
+            interpolator = None
+
+    if interpolator is None:
+        geoid_df = pd.read_csv(geoid_path)
+        os.makedirs(GEOID_CACHE_DIR, exist_ok=True)
+
+        geoid_grid = geoid_grid_from_df(geoid_df)
+        if geoid_grid is not None:
+            save_geoid_grid(geoid_grid, grid_path)
+            _interpolators[csv_key] = open_geoid_grid(grid_path)
+            return _interpolators[csv_key]
+
+        interpolator = build_geoid_interpolator(geoid_df, window)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(interpolator, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    _interpolators[key] = interpolator
+    return interpolator
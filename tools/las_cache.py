@@ -0,0 +1,189 @@
+import os
+import json
+import shutil
+import tempfile
+from collections import OrderedDict
+import numpy as np
+import laspy
+
+LAS_DIMENSIONS = (
+    "x", "y", "z", "intensity", "return_number", "scan_angle_rank",
+    "classification", "red", "green", "blue",
+)
+DEFAULT_MEMORY_BUDGET_MB = 2048
+COLUMN_STORE_DIR = ".columns"
+COLUMN_STORE_CHUNK_SIZE = 5_000_000
+
+# Decoded arrays shared by all pages and Streamlit reruns of the app process,
+# least recently used first
+_cache = OrderedDict()
+_memory_budget = [DEFAULT_MEMORY_BUDGET_MB * 1024 ** 2]
+
+
+def set_memory_budget(megabytes):
+    _memory_budget[0] = int(megabytes * 1024 ** 2)
+    _evict()
+
+
+def cache_size():
+    # Memory-mapped columns live in the OS page cache and do not count towards the budget
+    return sum(
+        arr.nbytes for arrays in _cache.values() for arr in arrays.values()
+        if arr is not None and not isinstance(arr, np.memmap)
+    )
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _evict(keep=None):
+    while _cache and cache_size() > _memory_budget[0]:
+        oldest = next(iter(_cache))
+        if oldest == keep:
+            if len(_cache) == 1:
+                break
+            _cache.move_to_end(oldest)
+            continue
+        del _cache[oldest]
+
+
+def column_store_path(path):
+    # input/las_geoid/.columns/<file name>/<dimension>.npy
+    return os.path.join(os.path.dirname(os.path.abspath(path)), COLUMN_STORE_DIR, os.path.basename(path))
+
+
+def _column_store_meta(store_dir):
+    try:
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _current_store_meta(path):
+    # Metadata of the column store, or None when it is missing or older than the LAS
+    stat = os.stat(path)
+    meta = _column_store_meta(column_store_path(path))
+    if meta is None or meta["mtime_ns"] != stat.st_mtime_ns or meta["size"] != stat.st_size:
+        return None
+    return meta
+
+
+def build_column_store(path, chunk_size=COLUMN_STORE_CHUNK_SIZE):
+    # One chunked pass over the LAS writes every dimension to its own .npy file,
+    # with x, y and z already scaled to float64
+    store_dir = column_store_path(path)
+    os.makedirs(os.path.dirname(store_dir), exist_ok=True)
+    # Every build writes to its own directory, so sessions building the same store concurrently
+    # do not delete each other's files
+    tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(store_dir) + ".", suffix=".tmp", dir=os.path.dirname(store_dir))
+    try:
+        _write_columns(path, tmp_dir, chunk_size)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, store_dir)
+    except OSError:
+        # Another session moved its store into place first; it was built from the same file
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return store_dir
+
+
+def _write_columns(path, tmp_dir, chunk_size):
+    stat = os.stat(path)
+    with laspy.open(path) as reader:
+        point_format = reader.header.point_format
+        point_count = reader.header.point_count
+        available = set(point_format.dimension_names) | {"x", "y", "z"}
+        dimensions = [name for name in LAS_DIMENSIONS if name in available]
+
+        columns = {}
+        for name in dimensions:
+            dtype = np.float64 if name in ("x", "y", "z") else (point_format.dimension_by_name(name).dtype or np.uint8)
+            columns[name] = np.lib.format.open_memmap(
+                os.path.join(tmp_dir, name + ".npy"), mode="w+", dtype=dtype, shape=(point_count,)
+            )
+
+        start = 0
+        for points in reader.chunk_iterator(chunk_size):
+            end = start + len(points)
+            for name in dimensions:
+                columns[name][start:end] = np.asarray(getattr(points, name))
+            start = end
+
+    for column in columns.values():
+        column.flush()
+    del columns
+
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "point_count": point_count, "dimensions": dimensions}, f)
+
+
+def open_columns(path, dimensions=LAS_DIMENSIONS):
+    # Memory-maps the requested columns, building the store on first use or when the LAS changed.
+    # Dimensions missing from the file are returned as None.
+    store_dir = column_store_path(path)
+    meta = _current_store_meta(path)
+    if meta is None:
+        build_column_store(path)
+        meta = _column_store_meta(store_dir)
+
+    return {
+        name: np.load(os.path.join(store_dir, name + ".npy"), mmap_mode="r") if name in meta["dimensions"] else None
+        for name in dimensions
+    }
+
+
+def _decode(path, dimensions):
+    # Dimensions missing from the point format are stored as None, so they are not looked up again
+    las = laspy.read(path)
+    available = set(las.point_format.dimension_names) | {"x", "y", "z"}
+    return {
+        name: np.array(getattr(las, name)) if name in available else None
+        for name in dimensions
+    }
+
+
+def load_las(path, dimensions=LAS_DIMENSIONS):
+    # Returns {dimension: array} for the requested dimensions present in the file, memory-mapped
+    # from the column store. The arrays are shared between callers and are read-only.
+    key = _file_key(path)
+
+    # Entries of older versions of the same file are stale
+    for stale in [k for k in _cache if k[0] == key[0] and k != key]:
+        del _cache[stale]
+
+    arrays = _cache.get(key, {})
+    missing = [name for name in dimensions if name not in arrays]
+    if missing:
+        try:
+            loaded = open_columns(path, missing)
+        except OSError:
+            # Read-only input folder: decode into memory instead. A first read decodes every
+            # cached dimension, so switching pages needs no further I/O
+            loaded = _decode(path, missing if key in _cache else list(dict.fromkeys([*LAS_DIMENSIONS, *missing])))
+        arrays = {**arrays, **loaded}
+        _cache[key] = arrays
+
+    _cache.move_to_end(key)
+    _evict(keep=key)
+    return {name: arrays[name] for name in dimensions if arrays.get(name) is not None}
+
+
+def read_las_once(path, dimensions=LAS_DIMENSIONS):
+    # For one-pass readers such as batch workers: memory-maps the column store when it already
+    # exists, otherwise decodes the LAS directly. No store is built and nothing is cached.
+    if _current_store_meta(path) is not None:
+        columns = open_columns(path, dimensions)
+    else:
+        columns = _decode(path, dimensions)
+    return {name: arr for name, arr in columns.items() if arr is not None}
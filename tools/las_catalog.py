@@ -0,0 +1,149 @@
+import os
+import re
+import glob
+import sqlite3
+import laspy
+import streamlit as st
+
+CATALOG_PATH = "input/.las_catalog.sqlite"
+
+COLUMNS = (
+    "path", "name", "folder", "mtime_ns", "size", "point_count", "point_format", "version",
+    "dimensions", "has_rgb", "xmin", "ymin", "zmin", "xmax", "ymax", "zmax", "crs", "survey_date",
+)
+
+
+def _connect():
+    os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
+    con = sqlite3.connect(CATALOG_PATH)
+    con.row_factory = sqlite3.Row
+    con.execute(f"CREATE TABLE IF NOT EXISTS las_files ({', '.join(COLUMNS)}, PRIMARY KEY (path))")
+    return con
+
+
+def _parse_crs(header):
+    try:
+        crs = header.parse_crs()
+    except Exception:
+        return None
+    if crs is None:
+        return None
+    epsg = crs.to_epsg()
+    return f"EPSG:{epsg}" if epsg else crs.name
+
+
+def _survey_date(path):
+    # File names of the project start with the survey date. The header creation date is not used:
+    # laspy sets it to the day a file is written, so processed files would show that day.
+    match = re.search(r"\d{4}-\d{2}-\d{2}", os.path.basename(path))
+    return match.group() if match else None
+
+
+def read_header_info(path):
+    # Header and VLRs only, no points are read
+    stat = os.stat(path)
+    with laspy.open(path) as reader:
+        header = reader.header
+        dimensions = list(header.point_format.dimension_names)
+        (xmin, ymin, zmin), (xmax, ymax, zmax) = header.mins, header.maxs
+        return {
+            "path": os.path.abspath(path),
+            "name": os.path.basename(path),
+            "folder": os.path.abspath(os.path.dirname(path)),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "point_count": header.point_count,
+            "point_format": header.point_format.id,
+            "version": str(header.version),
+            "dimensions": ",".join(dimensions),
+            "has_rgb": int("red" in dimensions),
+            "xmin": xmin, "ymin": ymin, "zmin": zmin,
+            "xmax": xmax, "ymax": ymax, "zmax": zmax,
+            "crs": _parse_crs(header),
+            "survey_date": _survey_date(path),
+        }
+
+
+def _refresh(con, folder, files):
+    known = {
+        row["path"]: row
+        for row in con.execute("SELECT * FROM las_files WHERE folder = ?", (folder,))
+    }
+
+    entries, unreadable = [], []
+    for path in files:
+        stat = os.stat(path)
+        row = known.pop(os.path.abspath(path), None)
+        if row is not None and row["mtime_ns"] == stat.st_mtime_ns and row["size"] == stat.st_size:
+            # Rows stored before the date came from the name alone may hold a header creation date
+            entries.append({**dict(row), "survey_date": _survey_date(path)})
+            continue
+        try:
+            info = read_header_info(path)
+        except Exception:
+            unreadable.append(os.path.basename(path))
+            continue
+        con.execute(
+            f"INSERT OR REPLACE INTO las_files VALUES ({', '.join('?' * len(COLUMNS))})",
+            [info[c] for c in COLUMNS]
+        )
+        entries.append(info)
+
+    con.executemany("DELETE FROM las_files WHERE path = ?", [(path,) for path in known])
+    return entries, unreadable
+
+
+def _read_headers(files):
+    entries, unreadable = [], []
+    for path in files:
+        try:
+            entries.append(read_header_info(path))
+        except Exception:
+            unreadable.append(os.path.basename(path))
+    return entries, unreadable
+
+
+def list_las_files(folder):
+    # Refreshes the catalogue of a folder incrementally: only new or modified files
+    # (by mtime and size) have their headers read, deleted files are dropped.
+    # Returns the entries and the names of files whose header could not be read.
+    files = sorted(glob.glob(os.path.join(folder, "*.las")))
+    try:
+        with _connect() as con:
+            return _refresh(con, os.path.abspath(folder), files)
+    except (sqlite3.Error, OSError):
+        # Read-only input folder: the headers are read on every visit without being stored
+        return _read_headers(files)
+
+
+def describe(entry):
+    parts = [entry["name"], f"{entry['point_count'] / 1e6:.1f} M pts"]
+    if entry["survey_date"]:
+        parts.append(entry["survey_date"])
+    if entry["has_rgb"]:
+        parts.append("RGB")
+    return " · ".join(parts)
+
+
+def select_las_file(label, folder, require_rgb=False, key=None):
+    # Selectbox of LAS files with header metadata; files unsuitable for the step are excluded
+    # without loading any points. Returns the file name, like the plain selectboxes it replaces.
+    entries, unreadable = list_las_files(folder)
+    rejected = [e["name"] for e in entries if require_rgb and not e["has_rgb"]]
+    entries = [e for e in entries if e["name"] not in rejected]
+
+    if rejected:
+        st.caption(f"Skipped (no RGB values): {', '.join(rejected)}")
+    if unreadable:
+        st.caption(f"Skipped (LAS header could not be read): {', '.join(unreadable)}")
+
+    by_name = {e["name"]: e for e in entries}
+    choice = st.selectbox(label, list(by_name), format_func=lambda name: describe(by_name[name]), key=key)
+    if choice is not None:
+        e = by_name[choice]
+        st.caption(
+            f"Bounds X {e['xmin']:.1f}–{e['xmax']:.1f}, Y {e['ymin']:.1f}–{e['ymax']:.1f}, "
+            f"Z {e['zmin']:.2f}–{e['zmax']:.2f} · point format {e['point_format']} (LAS {e['version']}) · "
+            f"CRS: {e['crs'] or 'not defined'}"
+        )
+    return choice
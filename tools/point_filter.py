@@ -0,0 +1,65 @@
+import numpy as np
+
+CHUNK_SIZE = 1_000_000
+
+# Conditions are (dimension, op, value) tuples, all of which must hold,
+# e.g. [("z", "<=", 2.0), ("intensity", ">", 85), ("scan_angle_rank", "abs>", 10)]
+OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+def _parse(op):
+    if op.startswith("abs"):
+        return True, OPERATORS[op[3:]]
+    return False, OPERATORS[op]
+
+
+def _evaluate_chunk(columns, conditions, part, out, scratch):
+    # ANDs every condition into out in place; scratch holds one comparison at a time
+    out[:] = True
+    for name, op, value in conditions:
+        use_abs, compare = _parse(op)
+        values = columns[name][part]
+        if use_abs:
+            values = np.abs(values)
+        compare(values, value, out=scratch)
+        np.logical_and(out, scratch, out=out)
+    return out
+
+
+def filter_mask(columns, conditions, chunk_size=CHUNK_SIZE, out=None):
+    # Boolean mask of the points meeting all conditions, evaluated chunk by chunk into one
+    # preallocated array instead of one full-length temporary per comparison
+    n = len(columns[conditions[0][0]])
+    if out is None:
+        out = np.empty(n, dtype=bool)
+    scratch = np.empty(min(chunk_size, n), dtype=bool)
+    for start in range(0, n, chunk_size):
+        part = slice(start, min(start + chunk_size, n))
+        length = part.stop - part.start
+        _evaluate_chunk(columns, conditions, part, out[part], scratch[:length])
+    return out
+
+
+def filter_select(columns, conditions, dimensions, chunk_size=CHUNK_SIZE):
+    # Selected values of the given dimensions as {dimension: array}, without a full-length mask
+    n = len(columns[conditions[0][0]])
+    chunk_mask = np.empty(min(chunk_size, n), dtype=bool)
+    scratch = np.empty_like(chunk_mask)
+    selected = {name: [] for name in dimensions}
+    for start in range(0, n, chunk_size):
+        part = slice(start, min(start + chunk_size, n))
+        length = part.stop - part.start
+        mask = _evaluate_chunk(columns, conditions, part, chunk_mask[:length], scratch[:length])
+        for name in dimensions:
+            selected[name].append(columns[name][part][mask])
+    return {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=columns[name].dtype)
+        for name, parts in selected.items()
+    }
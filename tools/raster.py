@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class PointGrid:
+    # Bins points into a regular 2D grid once; every statistic afterwards is a single
+    # bincount over the cached flat cell index. Grids have the same (nx, ny) layout
+    # and bin edges as scipy.stats.binned_statistic_2d(x, y, ..., bins=[nx, ny]).
+    def __init__(self, x, y, bins, range=None):
+        nx, ny = bins
+        if range is None:
+            range = ((np.min(x), np.max(x)), (np.min(y), np.max(y)))
+        (xmin, xmax), (ymin, ymax) = range
+        self.shape = (int(nx), int(ny))
+        self.x_edge = np.linspace(xmin, xmax, self.shape[0] + 1)
+        self.y_edge = np.linspace(ymin, ymax, self.shape[1] + 1)
+        self.extent = (xmin, xmax, ymin, ymax)
+
+        ix = self._cell_index(x, self.x_edge)
+        iy = self._cell_index(y, self.y_edge)
+        self.inside = (ix >= 0) & (iy >= 0)
+        self.index = np.where(self.inside, ix * self.shape[1] + iy, 0)
+        self.size = self.shape[0] * self.shape[1]
+        self._count = None
+
+    @staticmethod
+    def _cell_index(values, edges):
+        # Same rule as np.digitize in binned_statistic_dd: right edge belongs to the last bin
+        idx = np.searchsorted(edges, values, side='right') - 1
+        idx[values == edges[-1]] = len(edges) - 2
+        idx[(idx < 0) | (idx > len(edges) - 2)] = -1
+        return idx
+
+    def _bincount(self, weights=None):
+        if weights is None:
+            weights = self.inside
+        else:
+            weights = np.where(self.inside, weights, 0)
+        return np.bincount(self.index, weights=weights, minlength=self.size).reshape(self.shape)
+
+    def count(self, mask=None):
+        if mask is None:
+            if self._count is None:
+                self._count = self._bincount()
+            return self._count
+        return self._bincount(mask)
+
+    def sum(self, values):
+        return self._bincount(np.asarray(values, dtype=np.float64))
+
+    def mean(self, values):
+        count = self.count()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(count > 0, self.sum(values) / count, np.nan)
+
+    def fraction(self, mask):
+        return self.mean(np.asarray(mask, dtype=np.float64))
+
+    def _extreme(self, values, ufunc, fill):
+        out = np.full(self.size, fill)
+        ufunc.at(out, self.index[self.inside], np.asarray(values, dtype=np.float64)[self.inside])
+        out = out.reshape(self.shape)
+        out[self.count() == 0] = np.nan
+        return out
+
+    def min(self, values):
+        return self._extreme(values, np.minimum, np.inf)
+
+    def max(self, values):
+        return self._extreme(values, np.maximum, -np.inf)
+
+    def stats(self, **attributes):
+        # One result dict per attribute, e.g. grid.stats(z=z, intensity=intensity)
+        return {
+            name: {
+                "sum": self.sum(values),
+                "mean": self.mean(values),
+                "min": self.min(values),
+                "max": self.max(values),
+            }
+            for name, values in attributes.items()
+        }
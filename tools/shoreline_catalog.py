@@ -0,0 +1,166 @@
+import os
+import re
+import glob
+import sqlite3
+from datetime import datetime
+import numpy as np
+import geopandas as gpd
+import shapely
+
+CATALOG_PATH = "output/.shoreline_catalog.sqlite"
+SIMPLIFY_TOLERANCE = 0.05
+# Levels of detail kept for drawing, as simplification tolerances in metres
+LOD_TOLERANCES = (0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+
+COLUMNS = (
+    "path", "name", "folder", "mtime_ns", "size", "date", "method", "source_las",
+    "xmin", "ymin", "xmax", "ymax", "length", "vertices", "geometry",
+)
+
+# Output file suffix -> detection method
+METHODS = {"intensity": "intensity", "rgb": "rgb", "als": "scanline", "mosaic": "scanline"}
+
+
+def _connect():
+    os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
+    con = sqlite3.connect(CATALOG_PATH)
+    con.row_factory = sqlite3.Row
+    con.execute(f"CREATE TABLE IF NOT EXISTS shorelines ({', '.join(COLUMNS)}, PRIMARY KEY (path))")
+    con.execute("CREATE TABLE IF NOT EXISTS shoreline_lod (path, tolerance, vertices, geometry, PRIMARY KEY (path, tolerance))")
+    return con
+
+
+def _date_from_name(name):
+    match = re.search(r"\d{4}-\d{2}-\d{2}", name)
+    return match.group() if match else None
+
+
+def _method_from_name(name):
+    suffix = os.path.splitext(name)[0].split("_")[-1]
+    return METHODS.get(suffix)
+
+
+def read_shoreline_info(path, method=None, source_las=None):
+    # Parses the GeoJSON once; the catalogue keeps a lightly simplified copy of the geometry.
+    # Returns the catalogue row and the full line.
+    stat = os.stat(path)
+    gdf = gpd.read_file(path)
+    line = gdf.geometry.iloc[0] if not gdf.empty else None
+    name = os.path.basename(path)
+    info = {
+        "path": os.path.abspath(path),
+        "name": name,
+        "folder": os.path.abspath(os.path.dirname(path)),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "date": _date_from_name(name),
+        "method": method or _method_from_name(name),
+        "source_las": source_las,
+        "xmin": None, "ymin": None, "xmax": None, "ymax": None,
+        "length": None, "vertices": None, "geometry": None,
+    }
+    if line is not None:
+        xmin, ymin, xmax, ymax = line.bounds
+        info.update(
+            xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax,
+            length=line.length,
+            vertices=int(shapely.get_num_coordinates(line)),
+            geometry=shapely.to_wkb(line.simplify(SIMPLIFY_TOLERANCE, preserve_topology=True)),
+        )
+    return info, line
+
+
+def _lod_rows(path, line):
+    # Topology-preserving simplification of the line at every level, in one vectorised call
+    levels = shapely.simplify(np.full(len(LOD_TOLERANCES), line), LOD_TOLERANCES, preserve_topology=True)
+    return [
+        (path, tolerance, int(shapely.get_num_coordinates(geom)), shapely.to_wkb(geom))
+        for tolerance, geom in zip(LOD_TOLERANCES, levels)
+    ]
+
+
+def _insert(con, info, line=None):
+    con.execute(
+        f"INSERT OR REPLACE INTO shorelines VALUES ({', '.join('?' * len(COLUMNS))})",
+        [info[c] for c in COLUMNS]
+    )
+    con.execute("DELETE FROM shoreline_lod WHERE path = ?", (info["path"],))
+    if line is not None:
+        con.executemany("INSERT INTO shoreline_lod VALUES (?, ?, ?, ?)", _lod_rows(info["path"], line))
+
+
+def register_shoreline(path, method=None, source_las=None):
+    # Called by the detection steps right after writing a shoreline
+    info, line = read_shoreline_info(path, method, source_las)
+    with _connect() as con:
+        _insert(con, info, line)
+    return info
+
+
+def list_shorelines(folder="output", dated_only=True):
+    # Refreshes the catalogue of a folder incrementally: only new or modified files (by mtime
+    # and size) are parsed, deleted files are dropped. Entries are sorted by date; files
+    # without a line are left out.
+    folder_abs = os.path.abspath(folder)
+    files = sorted(glob.glob(os.path.join(folder, "*.geojson")))
+
+    with _connect() as con:
+        known = {
+            row["path"]: row
+            for row in con.execute("SELECT * FROM shorelines WHERE folder = ?", (folder_abs,))
+        }
+
+        entries = []
+        for path in files:
+            stat = os.stat(path)
+            row = known.pop(os.path.abspath(path), None)
+            if row is not None and row["mtime_ns"] == stat.st_mtime_ns and row["size"] == stat.st_size:
+                entries.append(dict(row))
+                continue
+            try:
+                info, line = read_shoreline_info(path, source_las=row["source_las"] if row is not None else None)
+            except Exception:
+                continue
+            _insert(con, info, line)
+            entries.append(info)
+
+        con.executemany("DELETE FROM shorelines WHERE path = ?", [(path,) for path in known])
+        con.executemany("DELETE FROM shoreline_lod WHERE path = ?", [(path,) for path in known])
+
+        # Catalogues written before levels of detail existed get them from the stored geometry
+        with_lod = {row[0] for row in con.execute("SELECT DISTINCT path FROM shoreline_lod")}
+        for entry in entries:
+            if entry["path"] not in with_lod and entry["geometry"] is not None:
+                con.executemany("INSERT INTO shoreline_lod VALUES (?, ?, ?, ?)", _lod_rows(entry["path"], shapely.from_wkb(entry["geometry"])))
+
+    for entry in entries:
+        entry["date"] = datetime.strptime(entry["date"], "%Y-%m-%d") if entry["date"] else None
+    entries = [e for e in entries if e["geometry"] is not None]
+    if dated_only:
+        entries = [e for e in entries if e["date"] is not None]
+    return sorted(entries, key=lambda e: (e["date"] or datetime.min, e["name"]))
+
+
+def catalog_geometry(entry):
+    # Simplified geometry stored in the catalogue, for drawing without parsing the GeoJSON
+    return shapely.from_wkb(entry["geometry"]) if entry["geometry"] is not None else None
+
+
+def plot_tolerance(extent, figsize, dpi):
+    # Half the ground size of one output pixel: detail below it cannot be seen
+    xmin, xmax, ymin, ymax = extent
+    width, height = figsize
+    return max((xmax - xmin) / (width * dpi), (ymax - ymin) / (height * dpi)) / 2
+
+
+def lod_geometry(entry, tolerance, default=None):
+    # Coarsest cached level of detail that is still finer than the tolerance.
+    # Without such a level, `default` (e.g. the full line) or the catalogue geometry is returned.
+    with _connect() as con:
+        row = con.execute(
+            "SELECT geometry FROM shoreline_lod WHERE path = ? AND tolerance <= ? ORDER BY tolerance DESC LIMIT 1",
+            (entry["path"], tolerance)
+        ).fetchone()
+    if row is not None:
+        return shapely.from_wkb(row["geometry"])
+    return default if default is not None else catalog_geometry(entry)
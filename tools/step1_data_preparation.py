@@ -1,29 +1,46 @@
 import os
+import time
+import shutil
+import struct
+import tempfile
 import pandas as pd
 import numpy as np
 import laspy
-from scipy.interpolate import griddata
 import streamlit as st
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tools.geoid import load_geoid_interpolator, las_bounds
+from tools.las_catalog import select_las_file
 
-def interpolate_geoid(x_coords, y_coords, x_geo, y_geo, geoid_vals):
-    return griddata(
-        points=np.column_stack((x_geo, y_geo)),
-        values=geoid_vals,
-        xi=(x_coords, y_coords),
-        method='linear'
-    )
+DEFAULT_CHUNK_SIZE = 5_000_000
 
-def adjust_las_to_geoid(las_path, geoid_df, output_dir):
+OUTPUT_MODES = {
+    "Full rewrite": "full",
+    "Streaming (read and write in chunks, for very large files)": "chunked",
+    "Z-only rewrite of a copy (uncompressed LAS)": "z_copy",
+    "Z-only rewrite in place (uncompressed LAS, moves the original file)": "z_inplace",
+}
+
+# Byte offset of MaxZ/MinZ in the public header block, identical for LAS 1.0-1.4
+LAS_HEADER_Z_BOUNDS_OFFSET = 211
+
+# Geoid interpolator of a batch worker process, set once by init_geoid_worker
+_worker_geoid = None
+
+def geoid_offsets(geoid_interpolator, x, y, stats=None):
+    # Points outside the geoid model keep their Z; they are counted in stats["outside_geoid"]
+    z_geoid = np.asarray(geoid_interpolator(x, y), dtype=np.float64)
+    missing = np.isnan(z_geoid)
+    if stats is not None:
+        stats["outside_geoid"] = stats.get("outside_geoid", 0) + int(np.count_nonzero(missing))
+    z_geoid[missing] = 0.0
+    return z_geoid
+
+def adjust_las_to_geoid(las_path, geoid_interpolator, output_dir, stats=None):
     try:
         las = laspy.read(las_path)
         x_las, y_las, z_las = las.x, las.y, las.z
 
-        x_geo = geoid_df['x'].values
-        y_geo = geoid_df['y'].values
-        geoid_vals = geoid_df['geoid'].values
-
-        z_geoid = interpolate_geoid(x_las, y_las, x_geo, y_geo, geoid_vals)
-        z_geoid = np.nan_to_num(z_geoid, nan=0.0)
+        z_geoid = geoid_offsets(geoid_interpolator, x_las, y_las, stats)
         z_corrected = z_las - z_geoid
         las.z = z_corrected
 
@@ -35,6 +52,152 @@ def adjust_las_to_geoid(las_path, geoid_df, output_dir):
     except Exception as e:
         return f"❌ Error processing {las_path}: {e}"
 
+def adjust_las_to_geoid_chunked(las_path, geoid_interpolator, output_dir, chunk_size=DEFAULT_CHUNK_SIZE, stats=None):
+    # Streams the file in fixed-size chunks, so peak memory depends on chunk_size, not on the point count
+    try:
+        output_filename = os.path.basename(las_path).replace(".las", "_geoid.las")
+        output_path = os.path.join(output_dir, output_filename)
+
+        # Written under a temporary name, so a failure never leaves a truncated *_geoid.las behind
+        tmp_path = output_path + ".tmp"
+        try:
+            with laspy.open(las_path) as reader:
+                with laspy.open(tmp_path, mode="w", header=reader.header) as writer:
+                    for points in reader.chunk_iterator(int(chunk_size)):
+                        z_geoid = geoid_offsets(geoid_interpolator, points.x, points.y, stats)
+                        points.z = points.z - z_geoid
+                        writer.write_points(points)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return output_path
+    except Exception as e:
+        return f"❌ Error processing {las_path}: {e}"
+
+def rewrite_las_z(las_path, geoid_interpolator, chunk_size=DEFAULT_CHUNK_SIZE, staged=False, stats=None):
+    # Updates only the Z integers of an uncompressed LAS through a memory-mapped view of the point records.
+    # With staged=True the corrected Z values go to a scratch file first and are copied into the LAS
+    # only after every chunk has been computed and range-checked, so a failure leaves the file untouched.
+    with laspy.open(las_path) as reader:
+        header = reader.header
+    if header.are_points_compressed:
+        raise ValueError("Z-only rewrite requires an uncompressed LAS file")
+
+    sx, sy, sz = header.scales
+    ox, oy, oz = header.offsets
+    # X, Y and Z are the first three int32 fields of every point format
+    record_dtype = np.dtype({
+        'names': ['X', 'Y', 'Z'],
+        'formats': ['<i4', '<i4', '<i4'],
+        'offsets': [0, 4, 8],
+        'itemsize': header.point_format.size,
+    })
+    n = header.point_count
+    chunk_size = int(chunk_size)
+    records = np.memmap(las_path, dtype=record_dtype, mode='r+', offset=header.offset_to_point_data, shape=(n,))
+
+    staging, staging_path = None, None
+    if staged and n > 0:
+        fd, staging_path = tempfile.mkstemp(suffix=".npy", dir=os.path.dirname(os.path.abspath(las_path)))
+        os.close(fd)
+    try:
+        staging = np.lib.format.open_memmap(staging_path, mode='w+', dtype=np.int32, shape=(n,)) if staging_path else None
+
+        z_min, z_max = np.inf, -np.inf
+        for start in range(0, n, chunk_size):
+            chunk = records[start:start + chunk_size]
+            x = chunk['X'] * sx + ox
+            y = chunk['Y'] * sy + oy
+            z_geoid = geoid_offsets(geoid_interpolator, x, y, stats)
+            z_raw = np.rint(chunk['Z'] - z_geoid / sz)
+            if z_raw.min() < np.iinfo(np.int32).min or z_raw.max() > np.iinfo(np.int32).max:
+                raise ValueError("Corrected Z does not fit the Z scale/offset of the file")
+            if staging is not None:
+                staging[start:start + chunk_size] = z_raw
+            else:
+                chunk['Z'] = z_raw.astype(np.int32)
+            z_min = min(z_min, z_raw.min() * sz + oz)
+            z_max = max(z_max, z_raw.max() * sz + oz)
+
+        if staging is not None:
+            for start in range(0, n, chunk_size):
+                records[start:start + chunk_size]['Z'] = staging[start:start + chunk_size]
+        records.flush()
+    finally:
+        # Memory maps are closed before the scratch file is removed (required on Windows)
+        del records, staging
+        if staging_path:
+            os.remove(staging_path)
+
+    if n > 0:
+        with open(las_path, "r+b") as f:
+            f.seek(LAS_HEADER_Z_BOUNDS_OFFSET)
+            f.write(struct.pack("<dd", z_max, z_min))
+
+def adjust_las_to_geoid_z_only(las_path, geoid_interpolator, output_dir, in_place=False, chunk_size=DEFAULT_CHUNK_SIZE, stats=None):
+    try:
+        output_filename = os.path.basename(las_path).replace(".las", "_geoid.las")
+        output_path = os.path.join(output_dir, output_filename)
+
+        if in_place:
+            rewrite_las_z(las_path, geoid_interpolator, chunk_size, staged=True, stats=stats)
+            os.replace(las_path, output_path)
+        else:
+            # The copy is corrected under a temporary name and renamed only when every chunk succeeded
+            tmp_path = output_path + ".tmp"
+            try:
+                shutil.copyfile(las_path, tmp_path)
+                rewrite_las_z(tmp_path, geoid_interpolator, chunk_size, stats=stats)
+                os.replace(tmp_path, output_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        return output_path
+    except Exception as e:
+        return f"❌ Error processing {las_path}: {e}"
+
+def adjust_las(las_path, geoid_interpolator, output_dir, mode="full", chunk_size=DEFAULT_CHUNK_SIZE, stats=None):
+    if mode == "chunked":
+        return adjust_las_to_geoid_chunked(las_path, geoid_interpolator, output_dir, chunk_size, stats)
+    if mode in ("z_copy", "z_inplace"):
+        return adjust_las_to_geoid_z_only(las_path, geoid_interpolator, output_dir, mode == "z_inplace", chunk_size, stats)
+    return adjust_las_to_geoid(las_path, geoid_interpolator, output_dir, stats)
+
+def outside_geoid_warning(file_name, outside):
+    return f"⚠️ {file_name}: {outside:,} points lie outside the geoid model; their Z was left uncorrected."
+
+def correct_file(las_path, geoid_interpolator, output_dir, mode="full", chunk_size=DEFAULT_CHUNK_SIZE):
+    start = time.perf_counter()
+    stats = {"outside_geoid": 0}
+    output = adjust_las(las_path, geoid_interpolator, output_dir, mode, chunk_size, stats)
+    failed = output.startswith("❌")
+    return {
+        "file": os.path.basename(las_path),
+        "output": None if failed else os.path.basename(output),
+        "time_s": round(time.perf_counter() - start, 2),
+        "outside_geoid": stats["outside_geoid"],
+        "error": output if failed else None,
+    }
+
+def init_geoid_worker(geoid_path, bounds):
+    # Workers open the geoid model prepared by the main process from the disk cache,
+    # so nothing but file paths is sent with each task
+    global _worker_geoid
+    _worker_geoid = load_geoid_interpolator(geoid_path, bounds)
+
+def correct_file_task(las_path, output_dir, mode="full", chunk_size=DEFAULT_CHUNK_SIZE):
+    return correct_file(las_path, _worker_geoid, output_dir, mode, chunk_size)
+
+def correct_batch_parallel(las_files, geoid_path, bounds, output_dir, workers, mode="full", chunk_size=DEFAULT_CHUNK_SIZE):
+    # Yields one result record per file, in order of completion
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_geoid_worker, initargs=(geoid_path, bounds)) as pool:
+        futures = [pool.submit(correct_file_task, las_file, output_dir, mode, chunk_size) for las_file in las_files]
+        for future in as_completed(futures):
+            yield future.result()
+
 def run():
     st.header("Data Preparation")
     st.markdown("This step adjusts the elevation of LAS files to the geoid model (e.g. EPSG:2180).")
@@ -44,6 +207,14 @@ def run():
     output_dir = "input/las_geoid"
     os.makedirs(output_dir, exist_ok=True)
 
+    output_mode = OUTPUT_MODES[st.selectbox("Output mode", list(OUTPUT_MODES))]
+    chunk_size = st.number_input("Chunk size [points]", min_value=100_000, value=DEFAULT_CHUNK_SIZE, step=1_000_000, disabled=output_mode == "full")
+    if output_mode == "z_inplace":
+        st.warning("⚠️ The original LAS file is modified and moved to input/las_geoid; it will no longer be available in input/las.")
+
+    def adjust(las_path, geoid_interpolator, stats):
+        return adjust_las(las_path, geoid_interpolator, output_dir, output_mode, chunk_size, stats)
+
     if mode == "Single file":
         geoid_files = [f for f in os.listdir("input/geoid") if f.endswith(".csv")]
         las_files = [f for f in os.listdir("input/las") if f.endswith(".las")]
@@ -57,7 +228,7 @@ def run():
 
         geoid_choice = st.selectbox("Select geoid model CSV", geoid_files)
         geoid_path = os.path.join("input/geoid", geoid_choice)
-        las_choice = st.selectbox("Select LAS file to adjust", las_files)
+        las_choice = select_las_file("Select LAS file to adjust", "input/las")
         las_file_path = os.path.join("input/las", las_choice)
 
         las_base = os.path.splitext(las_choice)[0]
@@ -74,13 +245,17 @@ def run():
                 st.error("Geoid file not found. Please check the path.")
                 return
 
-            geoid_df = pd.read_csv(geoid_path)
+            with st.spinner("Preparing geoid model..."):
+                geoid_interpolator = load_geoid_interpolator(geoid_path, las_bounds([las_file_path]))
             with st.spinner("Processing LAS file..."):
-                output = adjust_las_to_geoid(las_file_path, geoid_df, output_dir)
+                stats = {"outside_geoid": 0}
+                output = adjust(las_file_path, geoid_interpolator, stats)
                 if output.startswith("❌"):
                     st.error(output)
                 else:
                     st.success(f"File processed and saved to: {output}")
+                    if stats["outside_geoid"]:
+                        st.warning(outside_geoid_warning(las_choice, stats["outside_geoid"]))
 
     elif mode == "Batch processing (all files in input/las)":
         geoid_files = [f for f in os.listdir("input/geoid") if f.endswith(".csv")]
@@ -90,6 +265,7 @@ def run():
 
         geoid_choice = st.selectbox("Select geoid model CSV", geoid_files)
         geoid_path = os.path.join("input/geoid", geoid_choice)
+        workers = st.number_input("Parallel workers", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1, step=1)
 
         if st.button("Run batch processing"):
             las_folder = "input/las"
@@ -99,14 +275,31 @@ def run():
                 st.warning("No LAS files found in input/las.")
                 return
 
-            geoid_df = pd.read_csv(geoid_path)
+            # One geoid model, cropped to the whole batch, is shared by every file and worker
+            bounds = las_bounds(las_files)
+            with st.spinner("Preparing geoid model..."):
+                geoid_interpolator = load_geoid_interpolator(geoid_path, bounds)
 
-            with st.spinner("Processing all LAS files..."):
-                for las_file in las_files:
-                    output = adjust_las_to_geoid(las_file, geoid_df, output_dir)
-                    if output.startswith("❌"):
-                        st.error(output)
+            workers = min(int(workers), len(las_files))
+            if workers > 1:
+                results = correct_batch_parallel(las_files, geoid_path, bounds, output_dir, workers, output_mode, chunk_size)
+            else:
+                results = (correct_file(las_file, geoid_interpolator, output_dir, output_mode, chunk_size) for las_file in las_files)
+
+            progress = st.progress(0)
+            records = []
+            start = time.perf_counter()
+            with st.spinner(f"Processing all LAS files ({workers} worker(s))..."):
+                for result in results:
+                    records.append(result)
+                    if result["error"]:
+                        st.error(result["error"])
                     else:
-                        st.write(f"✅ {os.path.basename(las_file)} → {os.path.basename(output)}")
-                st.success("Batch processing completed.")
+                        st.write(f"✅ {result['file']} → {result['output']} ({result['time_s']:.1f} s)")
+                        if result["outside_geoid"]:
+                            st.warning(outside_geoid_warning(result["file"], result["outside_geoid"]))
+                    progress.progress(len(records) / len(las_files))
+
+            st.dataframe(pd.DataFrame(records))
+            st.success(f"Batch processing completed in {time.perf_counter() - start:.1f} s.")
 
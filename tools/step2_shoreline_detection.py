@@ -1,16 +1,21 @@
 import os
-import laspy
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.spatial import cKDTree, distance
+from scipy.spatial import cKDTree
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
 from shapely.geometry import LineString
 import geopandas as gpd
-from scipy.stats import binned_statistic_2d
 from skimage import feature
 from scipy.signal import savgol_filter
 from skimage.filters import threshold_otsu
-import networkx as nx
 import streamlit as st
+from tools.raster import PointGrid
+from tools.las_cache import load_las
+from tools.las_catalog import select_las_file
+from tools.point_filter import filter_mask, filter_select
+from tools.dem_cache import load_dem
+from tools.shoreline_catalog import register_shoreline
 
 def preview_intensity(las_path, z_threshold_value, cell_size, min_val, max_val):
     st.subheader("Intensity preview (before processing)")
@@ -19,22 +24,18 @@ def preview_intensity(las_path, z_threshold_value, cell_size, min_val, max_val):
         st.warning("LAS file not found.")
         return
 
-    las = laspy.read(las_path)
-    x, y, z = las.x, las.y, las.z
-    intensity = np.array(las.intensity)
-    scan_angle = np.array(las.scan_angle_rank)
+    las = load_las(las_path, ("x", "y", "z", "intensity", "scan_angle_rank"))
+    low = filter_select(las, [("z", "<=", z_threshold_value)], ("x", "y"))
+    x_masked, y_masked = low["x"], low["y"]
 
-    mask = z <= z_threshold_value
-    x_masked, y_masked, z_masked = x[mask], y[mask], z[mask]
-    intensity_masked = intensity[mask]
-    scan_angle_masked = scan_angle[mask]
-
-    range_mask = (intensity_masked >= min_val) & (intensity_masked <= max_val)
-    x_filtered = x_masked[range_mask]
-    y_filtered = y_masked[range_mask]
-    z_filtered = z_masked[range_mask]
-    intensity_filtered = intensity_masked[range_mask]
-    scan_angle_filtered = scan_angle_masked[range_mask]
+    filtered = filter_select(
+        las,
+        [("z", "<=", z_threshold_value), ("intensity", ">=", min_val), ("intensity", "<=", max_val)],
+        ("x", "y", "z", "intensity", "scan_angle_rank")
+    )
+    x_filtered, y_filtered, z_filtered = filtered["x"], filtered["y"], filtered["z"]
+    intensity_filtered = filtered["intensity"]
+    scan_angle_filtered = filtered["scan_angle_rank"]
 
     if len(intensity_filtered) == 0:
         st.warning("No intensity values in selected range.")
@@ -68,10 +69,11 @@ def preview_intensity(las_path, z_threshold_value, cell_size, min_val, max_val):
     nyb = int((y_masked.max() - y_masked.min()) / cell_size)
     extent = (x_masked.min(), x_masked.max(), y_masked.min(), y_masked.max())
 
+    # Points are binned once; all preview maps are derived from the same grid
+    grid = PointGrid(x_filtered, y_filtered, bins=[nxb, nyb])
+
     fig2, ax2 = plt.subplots(figsize=(10, 6))
-    intensity_grid, x_edge, y_edge, _ = binned_statistic_2d(
-        x_filtered, y_filtered, intensity_filtered, statistic='mean', bins=[nxb, nyb]
-    )
+    intensity_grid = grid.mean(intensity_filtered)
     im = ax2.imshow(intensity_grid.T, extent=extent, origin='lower', cmap='viridis')
     cbar = plt.colorbar(im, ax=ax2, label="Mean intensity")
     ax2.set_title("Mean intensity map (z <= threshold)")
@@ -81,9 +83,7 @@ def preview_intensity(las_path, z_threshold_value, cell_size, min_val, max_val):
 
     fig3b, ax3b = plt.subplots(figsize=(10, 6))
     binary_mask_custom = intensity_filtered > suggested_thresh
-    binned_custom, _, _, _ = binned_statistic_2d(
-        x_filtered, y_filtered, binary_mask_custom.astype(int), statistic='mean', bins=[nxb, nyb]
-    )
+    binned_custom = grid.fraction(binary_mask_custom)
     ax3b.imshow(binned_custom.T, extent=extent, origin='lower', cmap='coolwarm', vmin=0, vmax=1)
     ax3b.set_title("Suggested-thresholded regions (red = above, blue = below)")
     ax3b.set_xlabel("X [m]")
@@ -92,9 +92,7 @@ def preview_intensity(las_path, z_threshold_value, cell_size, min_val, max_val):
 
     fig3, ax3 = plt.subplots(figsize=(10, 6))
     binary_mask = intensity_filtered > otsu_thresh
-    binned_binary, _, _, _ = binned_statistic_2d(
-        x_filtered, y_filtered, binary_mask.astype(int), statistic='mean', bins=[nxb, nyb]
-    )
+    binned_binary = grid.fraction(binary_mask)
     ax3.imshow(binned_binary.T, extent=extent, origin='lower', cmap='coolwarm', vmin=0, vmax=1)
     ax3.set_title("Otsu-thresholded regions (red = above, blue = below)")
     ax3.set_xlabel("X [m]")
@@ -102,9 +100,7 @@ def preview_intensity(las_path, z_threshold_value, cell_size, min_val, max_val):
     st.pyplot(fig3)
 
     fig4, ax4 = plt.subplots(figsize=(10, 6))
-    scan_angle_grid, _, _, _ = binned_statistic_2d(
-        x_filtered, y_filtered, scan_angle_filtered, statistic='mean', bins=[nxb, nyb]
-    )
+    scan_angle_grid = grid.mean(scan_angle_filtered)
     im4 = ax4.imshow(scan_angle_grid.T, extent=extent, origin='lower', cmap='plasma')
     plt.colorbar(im4, ax=ax4, label='Mean scan angle [deg]')
     ax4.set_title("Scan angle map")
@@ -162,6 +158,43 @@ def preview_intensity(las_path, z_threshold_value, cell_size, min_val, max_val):
     st.session_state["suggested_z_dynamic"] = suggested_z
 
 
+def trace_shoreline_path(points, k=6, sweeps=4):
+    # Sparse k-NN graph: memory stays linear in the number of points
+    n = len(points)
+    tree = cKDTree(points)
+    dists, idxs = tree.query(points, k=min(k, n), workers=-1)
+    dists, idxs = dists.reshape(n, -1), idxs.reshape(n, -1)
+    rows = np.repeat(np.arange(n), idxs.shape[1] - 1)
+    # Zero-length edges would be dropped by the sparse matrix
+    weights = np.maximum(dists[:, 1:].ravel(), 1e-9)
+    graph = coo_matrix((weights, (rows, idxs[:, 1:].ravel())), shape=(n, n)).tocsr()
+    graph = graph.maximum(graph.T)
+
+    _, labels = connected_components(graph, directed=False)
+    nodes = np.flatnonzero(labels == np.argmax(np.bincount(labels)))
+    largest = graph[nodes][:, nodes]
+    pos = points[nodes]
+
+    # Double sweep for the farthest pair: jump to the point farthest from the current one
+    # until the distance stops growing, instead of computing all pairwise distances
+    u = np.argmax(np.sum((pos - pos[0]) ** 2, axis=1))
+    d_v = np.sum((pos - pos[u]) ** 2, axis=1)
+    v = np.argmax(d_v)
+    for _ in range(sweeps):
+        d_u = np.sum((pos - pos[v]) ** 2, axis=1)
+        w = np.argmax(d_u)
+        if d_u[w] <= d_v[v]:
+            break
+        u, v, d_v = v, w, d_u
+
+    _, predecessors = dijkstra(largest, directed=False, indices=u, return_predecessors=True)
+    path = [v]
+    while path[-1] != u:
+        path.append(predecessors[path[-1]])
+
+    return pos[path[::-1]]
+
+
 def run():
     st.header("Shoreline detection from UAV LiDAR")
     tabs = st.tabs(["Intensity preview", "Detection"])
@@ -169,8 +202,7 @@ def run():
     with tabs[1]:
         st.markdown("This step detects the shoreline based on point density analysis from the LiDAR file.")
 
-        las_files = [f for f in os.listdir("input/las_geoid") if f.endswith(".las")]
-        las_choice = st.selectbox("Select LAS file for coastline detection", las_files, key="detect_las_select")
+        las_choice = select_las_file("Select LAS file for coastline detection", "input/las_geoid", key="detect_las_select")
         las_path = os.path.join("input/las_geoid", las_choice)
         default_output = "output/" + las_choice.replace("_geoid.las", "_intensity.geojson")
         output_json = st.text_input("Output GeoJSON path", value=default_output)
@@ -198,11 +230,9 @@ def run():
                 st.error("LAS file not found.")
                 return
 
-            las = laspy.read(las_path)
-            x, y, z = las.x, las.y, las.z
-            intensity = np.array(las.intensity)
-            return_num = np.array(las.return_number)
-            scan_angle_vals = np.array(las.scan_angle_rank)
+            las = load_las(las_path, ("x", "y", "z", "intensity", "return_number", "scan_angle_rank"))
+            x, y, z = las["x"], las["y"], las["z"]
+            intensity = las["intensity"]
 
             mask_low_z = z <= z_threshold_value
             intensity_low = intensity[mask_low_z]
@@ -220,20 +250,12 @@ def run():
                 idx_near = np.where(np.abs(intensity_low - otsu_thresh) < 5)[0]
                 z_dynamic = np.percentile(z[mask_low_z][idx_near], 90) if len(idx_near) > 0 else 1.0
 
-            if derived_sign == '>':
-                mask = (
-                    (z <= z_dynamic) &
-                    (intensity > otsu_thresh) &
-                    (return_num <= return_number_max) &
-                    (np.abs(scan_angle_vals) > scan_angle_thresh)
-                )
-            else:
-                mask = (
-                    (z <= z_dynamic) &
-                    (intensity < otsu_thresh) &
-                    (return_num <= return_number_max) &
-                    (np.abs(scan_angle_vals) > scan_angle_thresh)
-                )
+            mask = filter_mask(las, [
+                ("z", "<=", z_dynamic),
+                ("intensity", derived_sign, otsu_thresh),
+                ("return_number", "<=", return_number_max),
+                ("scan_angle_rank", "abs>", scan_angle_thresh),
+            ])
 
             x_sel, y_sel, z_sel = x[mask], y[mask], z[mask]
 
@@ -241,56 +263,35 @@ def run():
             ymin, ymax = y.min(), y.max()
             nxb = int((xmax - xmin) / cell_size)
             nyb = int((ymax - ymin) / cell_size)
-            dem_grid, _, _, _ = binned_statistic_2d(x, y, z, statistic='mean', bins=[nxb, nyb])
-
-            count, x_edge, y_edge, _ = binned_statistic_2d(x_sel, y_sel, None, statistic='count', bins=[nxb, nyb])
-            count = np.nan_to_num(count)
+            # The DEM covers the full cloud and is built only when it is not cached for this
+            # file and cell size yet; the density is binned over the selected points' own extent
+            dem_grid, dem_extent = load_dem(las_path, cell_size)
+            sel_grid = PointGrid(x_sel, y_sel, bins=[nxb, nyb])
+            count = sel_grid.count().astype(float)
+            x_edge, y_edge = sel_grid.x_edge, sel_grid.y_edge
             edges = feature.canny(count, sigma=2)
 
             x_center = (x_edge[:-1] + x_edge[1:]) / 2
             y_center = (y_edge[:-1] + y_edge[1:]) / 2
 
-            edge_pts, edge_z = [], []
-            sel_tree = cKDTree(np.column_stack((x_sel, y_sel)))
-            for ix in range(edges.shape[0]):
-                for iy in range(edges.shape[1]):
-                    if edges[ix, iy]:
-                        xc, yc = x_center[ix], y_center[iy]
-                        edge_pts.append((xc, yc))
-                        _, nearest_idx = sel_tree.query([xc, yc], k=1)
-                        edge_z.append(z_sel[nearest_idx])
-
-            edge_pts = np.array(edge_pts)
-            edge_z = np.array(edge_z)
+            # All edge cells at once, with a single batched nearest-point query
+            ix, iy = np.nonzero(edges)
+            edge_pts = np.column_stack((x_center[ix], y_center[iy]))
 
             if len(edge_pts) > 0:
+                sel_tree = cKDTree(np.column_stack((x_sel, y_sel)))
+                _, nearest_idx = sel_tree.query(edge_pts, k=1, workers=-1)
+                edge_z = z_sel[nearest_idx]
+
                 tree = cKDTree(edge_pts)
-                neighbors = tree.query_ball_point(edge_pts, r=2.0)
-                mask_neighbors = np.array([len(n) > 4 for n in neighbors])
+                neighbor_counts = tree.query_ball_point(edge_pts, r=2.0, return_length=True, workers=-1)
+                mask_neighbors = neighbor_counts > 4
                 z_thresh = np.percentile(edge_z, 10)
                 mask_z = edge_z > z_thresh
                 final_mask = mask_neighbors & mask_z
                 clean_pts = edge_pts[final_mask]
 
-                graph = nx.Graph()
-                for i, (xi, yi) in enumerate(clean_pts):
-                    graph.add_node(i, pos=(xi, yi))
-
-                tree = cKDTree(clean_pts)
-                for i, pt in enumerate(clean_pts):
-                    dists, idxs = tree.query(pt, k=6)
-                    for j in range(1, len(idxs)):
-                        graph.add_edge(i, idxs[j], weight=dists[j])
-
-                components = sorted(nx.connected_components(graph), key=len, reverse=True)
-                largest = graph.subgraph(components[0])
-                pos_array = np.array([graph.nodes[n]['pos'] for n in largest.nodes])
-                dist_matrix = distance.squareform(distance.pdist(pos_array))
-                i, j = np.unravel_index(np.argmax(dist_matrix), dist_matrix.shape)
-                node_list = list(largest.nodes)
-                u, v = node_list[i], node_list[j]
-                path = nx.dijkstra_path(largest, u, v)
-                line_coords = [graph.nodes[n]['pos'] for n in path]
+                line_coords = trace_shoreline_path(clean_pts)
 
                 x_coords, y_coords = zip(*line_coords)
                 window = min(21, len(x_coords) - 1 if len(x_coords) % 2 == 0 else len(x_coords))
@@ -302,12 +303,13 @@ def run():
                 shoreline_line = LineString(line_coords)
                 gdf = gpd.GeoDataFrame(geometry=[shoreline_line], crs="EPSG:2180")
                 gdf.to_file(output_json, driver="GeoJSON")
+                register_shoreline(output_json, "intensity", las_path)
 
                 st.success(f"Shoreline saved to {output_json}")
 
                 png_path = os.path.join(output_png_dir, os.path.basename(las_path).replace(".las", ".png"))
                 plt.figure(figsize=(12, 6))
-                plt.imshow(dem_grid.T, extent=(xmin, xmax, ymin, ymax), origin='lower', cmap='terrain')
+                plt.imshow(dem_grid.T, extent=dem_extent, origin='lower', cmap='terrain')
                 plt.plot(*shoreline_line.xy, color='red', linewidth=2, label="Shoreline")
                 plt.colorbar(label='Elevation [m a.s.l.]')
                 plt.legend()
@@ -323,8 +325,7 @@ def run():
 
     with tabs[0]:
         st.markdown("This tab shows an intensity preview to help choose good parameters before running detection.")
-        las_files = [f for f in os.listdir("input/las_geoid") if f.endswith(".las")]
-        las_choice = st.selectbox("Select LAS file for intensity preview", las_files, key="las_preview_select")
+        las_choice = select_las_file("Select LAS file for intensity preview", "input/las_geoid", key="las_preview_select")
         las_path = os.path.join("input/las_geoid", las_choice)
         z_threshold_value = st.number_input("Z max threshold for preview", value=2.0, key="z_preview")
         cell_size = st.number_input("Grid cell size for preview", value=0.5, step=0.1, key="cell_preview")
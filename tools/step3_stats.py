@@ -1,40 +1,155 @@
 import os
-import re
 import numpy as np
+import pandas as pd
 import geopandas as gpd
+import shapely
 import streamlit as st
 from shapely.geometry import LineString, Point
-from datetime import datetime
 import matplotlib.pyplot as plt
 import matplotlib.image as mpimg
+from tools.shoreline_catalog import list_shorelines, lod_geometry, plot_tolerance
+from tools.transects import interpolate_along_line, distance_to_line, cast_transects, transect_positions, envelope_stats, shoreline_rates
 
-def extract_date(filename):
-    match = re.search(r"\d{4}-\d{2}-\d{2}", filename)
-    if match:
-        return datetime.strptime(match.group(), "%Y-%m-%d")
-    return None
+# st.pyplot renders figures at 200 DPI
+DISPLAY_DPI = 200
 
 def sample_points_along_line(line, spacing):
     length = line.length
     num_points = int(length // spacing)
-    return [line.interpolate(i * spacing) for i in range(num_points + 1)]
+    return interpolate_along_line(line, np.arange(num_points + 1) * spacing)
+
+def sce_distances(ref_line, comparison_line, spacing):
+    sample_pts = sample_points_along_line(ref_line, spacing)
+    d_ref = distance_to_line(ref_line, sample_pts)
+    d_comp = distance_to_line(comparison_line, sample_pts)
+    return gpd.GeoDataFrame(
+        {"max_dist": np.maximum(d_ref, d_comp), "mean_dist": (d_ref + d_comp) / 2},
+        geometry=sample_pts, crs="EPSG:2180"
+    )
+
+def multi_date_sce(baseline, shorelines, spacing, transect_length, smoothing):
+    stations, origins, normals, transects = cast_transects(baseline, spacing, transect_length, smoothing)
+    positions = transect_positions(transects, origins, normals, transect_length, shorelines)
+    stats = envelope_stats(positions)
+    gdf = gpd.GeoDataFrame(
+        {"transect": np.arange(len(transects)), "station": stations, **stats},
+        geometry=transects, crs="EPSG:2180"
+    )
+    return gdf, positions
+
+def run_multi_date(folder, dated_files, file_options):
+    st.markdown("**Shoreline Change Envelope over all selected dates along shore-normal transects:**")
+    by_label = dict(zip(file_options, dated_files))
+
+    baseline_choice = st.selectbox("Baseline shoreline (transect origin)", file_options, index=0)
+    source = baseline_choice.split(" (", 1)[1]
+    selected = st.multiselect(
+        "Shorelines", file_options,
+        default=[label for label in file_options if label.endswith(f"({source}")]
+    )
+    spacing = st.number_input("Spacing between transects [m]", min_value=0.1, value=1.0, step=0.1)
+    transect_length = st.number_input("Transect length [m]", min_value=1.0, value=200.0, step=10.0)
+    smoothing = st.number_input("Baseline smoothing for transect direction [m]", min_value=0.1, value=10.0, step=1.0)
+
+    if not st.button("Calculate"):
+        return
+    if len(selected) < 2:
+        st.warning("At least two dated shoreline files are required.")
+        return
+
+    selected = sorted(selected, key=lambda label: by_label[label][1])
+    shorelines = [gpd.read_file(os.path.join(folder, by_label[label][0])).geometry.iloc[0] for label in selected]
+    baseline = gpd.read_file(os.path.join(folder, by_label[baseline_choice][0])).geometry.iloc[0]
+
+    gdf_out, positions = multi_date_sce(baseline, shorelines, spacing, transect_length, smoothing)
+    if np.all(np.isnan(positions)):
+        st.warning("No shoreline crosses the transects. Try a longer transect length.")
+        return
+
+    os.makedirs("output/sce", exist_ok=True)
+    gdf_out.to_file("output/sce/sce_multi_stats.geojson", driver="GeoJSON")
+    gdf_out.drop(columns="geometry").to_csv("output/sce/sce_multi_stats.csv", index=False)
+    positions_df = pd.DataFrame(positions, columns=[str(by_label[label][1].date()) for label in selected])
+    positions_df.insert(0, "transect", gdf_out["transect"])
+    positions_df.to_csv("output/sce/sce_positions.csv", index=False)
+
+    # DSAS rates in metres per year, from the time since the first selected survey
+    dates = [by_label[label][1] for label in selected]
+    years = np.array([(d - dates[0]).days / 365.25 for d in dates])
+    rates = shoreline_rates(positions, years)
+    rates_out = gpd.GeoDataFrame(
+        {"transect": gdf_out["transect"], "station": gdf_out["station"], **rates},
+        geometry=gdf_out.geometry, crs="EPSG:2180"
+    )
+    rates_out.to_file("output/sce/sce_rates.geojson", driver="GeoJSON")
+    rates_out.drop(columns="geometry").to_csv("output/sce/sce_rates.csv", index=False)
+
+    st.subheader("SCE Statistics Table")
+    st.dataframe(gdf_out.drop(columns=["geometry"]))
+
+    st.markdown(f"""
+    **Summary ({len(selected)} dates, {len(gdf_out)} transects):**
+    - Max. envelope: **{np.nanmax(gdf_out["sce"]):.2f} m**
+    - Mean envelope: **{np.nanmean(gdf_out["sce"]):.2f} m**
+    - Mean standard deviation of position: **{np.nanmean(gdf_out["std_position"]):.2f} m**
+    """)
+
+    st.subheader("Profile")
+    fig, ax = plt.subplots(figsize=(10, 4))
+    ax.plot(gdf_out["station"], gdf_out["sce"], label="Envelope (max - min)", color="black")
+    ax.fill_between(
+        gdf_out["station"], gdf_out["mean_position"] - gdf_out["std_position"],
+        gdf_out["mean_position"] + gdf_out["std_position"], color="blue", alpha=0.2, label="Mean ± std"
+    )
+    ax.plot(gdf_out["station"], gdf_out["mean_position"], label="Mean position", linestyle=":", color="blue")
+    ax.set_xlabel("Distance along baseline [m]")
+    ax.set_ylabel("Distance [m]")
+    ax.set_title(f"Shoreline Change Envelope ({selected[0].split(' ')[0]} – {selected[-1].split(' ')[0]})")
+    ax.legend()
+    st.pyplot(fig)
+
+    st.subheader("Rates of change (DSAS)")
+    st.dataframe(rates_out.drop(columns=["geometry"]))
+    st.markdown(f"""
+    **Summary (positive = towards the left of the baseline direction):**
+    - Mean NSM: **{np.nanmean(rates["nsm"]):.2f} m**
+    - Mean EPR: **{np.nanmean(rates["epr"]):.2f} m/yr**
+    - Mean LRR: **{np.nanmean(rates["lrr"]):.2f} m/yr**
+    """)
+
+    fig_rates, ax_rates = plt.subplots(figsize=(10, 4))
+    ax_rates.plot(gdf_out["station"], rates["epr"], label="EPR", color="red")
+    ax_rates.plot(gdf_out["station"], rates["lrr"], label="LRR", color="black", linestyle="--")
+    ax_rates.axhline(0, color="gray", linewidth=0.8)
+    ax_rates.set_xlabel("Distance along baseline [m]")
+    ax_rates.set_ylabel("Rate [m/yr]")
+    ax_rates.set_title("Shoreline change rates")
+    ax_rates.legend()
+    st.pyplot(fig_rates)
+
+    st.success("Results saved to output/sce/sce_multi_stats.geojson, sce_multi_stats.csv, sce_positions.csv and sce_rates.geojson / .csv")
 
 def run():
     st.header("Statistics")
     st.markdown("This step computes the Shoreline Change Envelope (SCE) based on selected shorelines.")
 
     folder = "output"
-    files = [f for f in os.listdir(folder) if f.endswith(".geojson")]
-    dated_files = [(f, extract_date(f)) for f in files if extract_date(f)]
-    dated_files = sorted(dated_files, key=lambda x: x[1])
+    entries = list_shorelines(folder)
+    dated_files = [(e["name"], e["date"]) for e in entries]
 
     if len(dated_files) < 2:
         st.warning("At least two dated shoreline files are required.")
         return
 
-    st.markdown("**Select two shoreline files to compare:**")
     file_options = [f"{d.date()} ({'_'.join(f.split('_')[1:]).replace('.geojson','')})" for f, d in dated_files]
 
+    sce_mode = st.radio("SCE mode", ["Two shorelines", "All selected dates"], horizontal=True)
+    if sce_mode == "All selected dates":
+        run_multi_date(folder, dated_files, file_options)
+        return
+
+    st.markdown("**Select two shoreline files to compare:**")
+
     ref_choice = st.selectbox("Reference shoreline", file_options, index=0)
     comp_choice = st.selectbox("Comparison shoreline", file_options, index=len(file_options)-1)
 
@@ -89,43 +204,13 @@ def run():
 
 
     if st.button("Calculate"):
-        folder = "output"
-        files = [f for f in os.listdir(folder) if f.endswith(".geojson")]
-        dated_files = [(f, extract_date(f)) for f in files if extract_date(f)]
-        dated_files = sorted(dated_files, key=lambda x: x[1])
-
-        if len(dated_files) < 2:
-            st.warning("At least two dated shoreline files are required.")
-            return
-
-        # Load all shorelines
-        shorelines = {}
-        for fname, date in dated_files:
-            gdf = gpd.read_file(os.path.join(folder, fname))
-            line = gdf.geometry.iloc[0]
-            shorelines[date] = line
-
-        ref_date = extract_date(ref_file)
-        comp_date = extract_date(comp_file)
-        ref_line = shorelines[ref_date]
+        # Only the two compared shorelines are parsed
+        ref_line = gpd.read_file(os.path.join(folder, ref_file)).geometry.iloc[0]
+        comp_line = gpd.read_file(os.path.join(folder, comp_file)).geometry.iloc[0]
         latest_date = comp_date
         st.info(f"Reference shoreline: {ref_date.date()}")
 
-        sample_pts = sample_points_along_line(ref_line, spacing)
-        results = []
-
-        comparison_line = shorelines[comp_date]
-
-        for pt in sample_pts:
-            d_ref = ref_line.distance(pt)
-            d_comp = comparison_line.distance(pt)
-            results.append({
-                "geometry": pt,
-                "max_dist": max(d_ref, d_comp),
-                "mean_dist": np.mean([d_ref, d_comp])
-            })
-
-        gdf_out = gpd.GeoDataFrame(results, crs="EPSG:2180")
+        gdf_out = sce_distances(ref_line, comp_line, spacing)
 
         # Save results
         os.makedirs("output/sce", exist_ok=True)
@@ -160,28 +245,15 @@ def run():
         # Optional: display both shorelines over DEM
         st.subheader("Fast shorelines comparison")
 
-        # Recreate DEM using all lines' points
-        all_coords = []
-        for line in shorelines.values():
-            all_coords.extend(list(line.coords))
-        all_coords = np.array(all_coords)
-        x_all, y_all = all_coords[:, 0], all_coords[:, 1]
-
-        # Mock elevation (just for visualization purposes)
-        from scipy.stats import binned_statistic_2d
-        from matplotlib.colors import LightSource
-
-        xmin, xmax = x_all.min(), x_all.max()
-        ymin, ymax = y_all.min(), y_all.max()
-        cell_size = spacing  # reuse spacing as resolution
-        nx = int((xmax - xmin) / cell_size)
-        ny = int((ymax - ymin) / cell_size)
-
         # Plot background
         fig2, ax2 = plt.subplots(figsize=(10, 6))
 
-        ref_line_xy = np.array(ref_line.coords)
-        comp_line_xy = np.array(shorelines[comp_date].coords)
+        # Plotted lines are simplified to the ground size of a display pixel
+        by_name = {e["name"]: e for e in entries}
+        lx0, ly0, lx1, ly1 = shapely.total_bounds([ref_line, comp_line])
+        tolerance = plot_tolerance((lx0, lx1, ly0, ly1), (10, 6), DISPLAY_DPI)
+        ref_line_xy = np.array(lod_geometry(by_name[ref_file], tolerance, ref_line).coords)
+        comp_line_xy = np.array(lod_geometry(by_name[comp_file], tolerance, comp_line).coords)
 
 
         ax2.plot(ref_line_xy[:, 0], ref_line_xy[:, 1], color='blue', label=f"Reference ({ref_date.date()})")
@@ -192,8 +264,7 @@ def run():
         ax2.legend()
         st.pyplot(fig2)
 
-        import laspy
-        from scipy.stats import binned_statistic_2d
+        from tools.dem_cache import load_dem
 
         st.subheader("Shoreline comparison on reference DEM")
 
@@ -205,24 +276,15 @@ def run():
             st.warning(f"Missing reference LAS file: {las_filename}")
             return
 
-        # Read LAS and create DEM
-        las = laspy.read(las_filename)
-        x, y, z = las.x, las.y, las.z
-
-        xmin, xmax = x.min(), x.max()
-        ymin, ymax = y.min(), y.max()
-        nxb = int((xmax - xmin) / dem_cell_size)
-        nyb = int((ymax - ymin) / dem_cell_size)
-
-        dem_grid, _, _, _ = binned_statistic_2d(x, y, z, statistic='mean', bins=[nxb, nyb])
+        # DEM of the reference survey, built from the LAS only once per cell size
+        dem_grid, extent = load_dem(las_filename, dem_cell_size)
         dem_grid = np.nan_to_num(dem_grid)
 
-        comp_line = shorelines[comp_date]
-        ref_coords = np.array(ref_line.coords)
-        comp_coords = np.array(comp_line.coords)
+        tolerance = plot_tolerance(extent, (12, 6), DISPLAY_DPI)
+        ref_coords = np.array(lod_geometry(by_name[ref_file], tolerance, ref_line).coords)
+        comp_coords = np.array(lod_geometry(by_name[comp_file], tolerance, comp_line).coords)
 
         fig4, ax4 = plt.subplots(figsize=(12, 6))
-        extent = (xmin, xmax, ymin, ymax)
         im = ax4.imshow(dem_grid.T, extent=extent, origin='lower', cmap='terrain')
         cbar = plt.colorbar(im, ax=ax4, label='Elevation [m a.s.l.]')
 
@@ -1,23 +1,9 @@
 import os
-import re
-import numpy as np
-import geopandas as gpd
-import matplotlib.pyplot as plt
-from shapely.geometry import LineString
 import streamlit as st
-from datetime import datetime
-from io import BytesIO
 from matplotlib.cm import get_cmap
-from PIL import Image
-import base64
 from streamlit_sortables import sort_items
-
-
-def extract_date(filename):
-    match = re.search(r"\d{4}-\d{2}-\d{2}", filename)
-    if match:
-        return datetime.strptime(match.group(), "%Y-%m-%d")
-    return None
+from tools.shoreline_catalog import list_shorelines, lod_geometry, plot_tolerance
+from tools.animation import AnimationRenderer, shared_palette, save_gif, save_video, video_available
 
 
 def run():
@@ -25,15 +11,14 @@ def run():
     st.markdown("This step creates a GIF animation showing cumulative shoreline changes over time.")
 
     output_dir = "output"
-    files = [f for f in os.listdir(output_dir) if f.endswith(".geojson")]
-    files_with_dates = [(f, extract_date(f)) for f in files if extract_date(f)]
+    entries = {e["name"]: e for e in list_shorelines(output_dir)}
 
-    if not files_with_dates:
+    if not entries:
         st.warning("No valid dated GeoJSON files found.")
         return
 
     
-    file_selection = st.multiselect("Select GeoJSON files to include in animation:", options=[f[0] for f in sorted(files_with_dates, key=lambda x: x[1])])
+    file_selection = st.multiselect("Select GeoJSON files to include in animation:", options=list(entries))
 
     if len(file_selection) < 2:
         st.warning("At least two files must be selected for animation.")
@@ -42,69 +27,50 @@ def run():
     dpi = st.slider("GIF resolution (DPI)", 50, 300, 150)
     frame_duration_s = st.slider("Frame duration (seconds)", 0.5, 5.0, 1.0, step=0.1)
     line_width = st.slider("Line width", 1, 5, 2)
+    formats = ["GIF", "MP4", "WebM"] if video_available() else ["GIF"]
+    output_format = st.radio("Output format", formats, horizontal=True)
+    if not video_available():
+        st.caption("MP4 and WebM output need the optional `imageio` and `imageio-ffmpeg` packages.")
     generate = st.button("Generate animation")
 
     if not generate:
         return
 
-    lines, dates = [], []
-    for fname in file_selection:
-        gdf = gpd.read_file(os.path.join(output_dir, fname))
-        date = extract_date(fname)
-        if gdf.empty or date is None:
-            continue
-        lines.append(gdf.geometry.iloc[0])
-        dates.append(date)
-
-    all_coords = np.concatenate([np.array(line.coords) for line in lines])
-    x_all, y_all = all_coords[:, 0], all_coords[:, 1]
-    xmin, xmax = x_all.min(), x_all.max()
-    ymin, ymax = y_all.min(), y_all.max()
+    # Geometries come from the shoreline catalogue, no GeoJSON is parsed. Each line is
+    # drawn at the level of detail matching the GIF pixel size.
+    selected = [entries[fname] for fname in file_selection]
+    xmin, xmax = min(e["xmin"] for e in selected), max(e["xmax"] for e in selected)
+    ymin, ymax = min(e["ymin"] for e in selected), max(e["ymax"] for e in selected)
+    tolerance = plot_tolerance((xmin, xmax, ymin, ymax), (10, 6), dpi)
+    lines = [lod_geometry(e, tolerance) for e in selected]
+    dates = [e["date"] for e in selected]
 
     cmap = get_cmap("tab10") if len(lines) <= 10 else get_cmap("viridis")
     colors = [cmap(i / (len(lines) - 1)) for i in range(len(lines))]
 
-    pil_frames = []
-    for i in range(1, len(lines) + 1):
-        fig, ax = plt.subplots(figsize=(10, 6))
-        for j in range(i):
-            coords = np.array(lines[j].coords)
-            label = dates[j].strftime("%Y-%m-%d")
-            ax.plot(coords[:, 0], coords[:, 1], color=colors[j], linewidth=line_width, label=label)
-
-        ax.set_xlim(xmin, xmax)
-        ax.set_ylim(ymin, ymax)
-        ax.set_title("Shoreline evolution")
-        ax.set_xlabel("X [m]")
-        ax.set_ylabel("Y [m]")
-        ax.legend(loc="upper left")
-        ax.set_aspect("equal")
-        plt.tight_layout()
-
-        buf = BytesIO()
-        fig.savefig(buf, format="png", dpi=dpi)
-        buf.seek(0)
-        pil_image = Image.open(buf).convert("RGB")
-        pil_frames.append(pil_image)
-        plt.close(fig)
-
-    gif_path = os.path.join(output_dir, "shoreline_animation.gif")
-    pil_frames[0].save(
-        gif_path,
-        save_all=True,
-        append_images=pil_frames[1:],
-        duration=int(frame_duration_s * 1000),
-        loop=0
+    renderer = AnimationRenderer((xmin, xmax, ymin, ymax), dpi, line_width)
+    frames = (
+        renderer.add(line, color, date.strftime("%Y-%m-%d"))
+        for line, color, date in zip(lines, colors, dates)
     )
 
-    st.success(f"GIF saved to: {gif_path}")
-
-    with open(gif_path, "rb") as f:
-        b64 = base64.b64encode(f.read()).decode("utf-8")
-        st.markdown(
-            f'<img src="data:image/gif;base64,{b64}" alt="Shoreline animation" style="width:100%;"/>',
-            unsafe_allow_html=True
-        )
-        st.markdown(
-            f'[Download GIF](data:application/octet-stream;base64,{b64})'
+    # Frames are rendered lazily and written to disk as they are encoded
+    duration_ms = int(frame_duration_s * 1000)
+    out_path = os.path.join(output_dir, f"shoreline_animation.{output_format.lower()}")
+    if output_format == "GIF":
+        save_gif(out_path, frames, shared_palette(colors), duration_ms)
+    else:
+        save_video(out_path, frames, duration_ms)
+
+    st.success(f"{output_format} saved to: {out_path}")
+
+    mime = {"GIF": "image/gif", "MP4": "video/mp4", "WebM": "video/webm"}[output_format]
+    if output_format == "GIF":
+        st.image(out_path, caption="Shoreline animation", width="stretch")
+    else:
+        st.video(out_path, format=mime, loop=True)
+    with open(out_path, "rb") as f:
+        st.download_button(
+            f"Download {output_format}", f, file_name=os.path.basename(out_path),
+            mime=mime, on_click="ignore"
         )
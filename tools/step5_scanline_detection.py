@@ -1,39 +1,31 @@
 import streamlit as st
 import os
 import glob
-import laspy
+import time
 import numpy as np
+import laspy
 import matplotlib.pyplot as plt
-from shapely.geometry import LineString
+from shapely.geometry import LineString, box
+from shapely import STRtree
 import geojson
 from shapely.geometry import mapping
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from fiona import collection
 from fiona.crs import from_epsg
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tools.las_cache import load_las, read_las_once
+from tools.edge_line import edge_points_per_bin
+from tools.las_catalog import select_las_file
+from tools.shoreline_catalog import register_shoreline
 
+STREAM_CHUNK_SIZE = 5_000_000
+MAX_PLOT_POINTS = 200_000
+MOSAIC_BUFFER = 5.0
 
-def detect_edge_line(points, axis='y', resolution=1.0, mode='upper'):
-    x, y = points[:, 0], points[:, 1]
-    bins = np.round(x / resolution) * resolution
-    idx_sort = np.argsort(x)
-    x_sorted = x[idx_sort]
-    y_sorted = y[idx_sort]
-    bins_sorted = bins[idx_sort]
-
-    unique_bins = np.unique(bins_sorted)
-    edge_points = []
-
-    for ub in unique_bins:
-        bin_mask = bins_sorted == ub
-        if not np.any(bin_mask):
-            continue
-        ys = y_sorted[bin_mask]
-        xs = x_sorted[bin_mask]
-        if mode == 'upper':
-            i = np.argmax(ys)
-        else:
-            i = np.argmin(ys)
-        edge_points.append((xs[i], ys[i]))
 
+def detect_edge_line(points, axis='y', resolution=1.0, mode='upper'):
+    edge_points = edge_points_per_bin(points, resolution=resolution, mode=mode)
     return LineString(edge_points)
 
 
@@ -46,43 +38,126 @@ def save_shapefile(line, output_file, epsg):
         })
 
 
-def process_las_file(las_path, output_path, epsg, plot=False, export_shp=False, mode='upper'):
-    las = laspy.read(las_path)
-    x, y = las.x, las.y
-    classification = las.classification
+def stream_classified_las(las_path, mode='upper', resolution=1.0, chunk_size=STREAM_CHUNK_SIZE):
+    # Reads the LAS in chunks and keeps only running per-bin edge points, the x-range of
+    # ground (2) and water (9) points and a bounded plot sample: memory is O(bins), not O(points).
+    # The result equals detect_edge_line(teren[::2]) on the fully loaded cloud.
+    edge_points = np.empty((0, 2))
+    ranges = {2: [np.inf, -np.inf], 9: [np.inf, -np.inf]}
+    seen = {2: 0, 9: 0}
+    samples = {2: [], 9: []}
 
-    teren = np.column_stack((x[classification == 2], y[classification == 2]))
-    woda = np.column_stack((x[classification == 9], y[classification == 9]))
+    with laspy.open(las_path) as reader:
+        plot_stride = max(10, reader.header.point_count // MAX_PLOT_POINTS)
+        for points in reader.chunk_iterator(int(chunk_size)):
+            classification = np.asarray(points.classification)
+            x, y = np.asarray(points.x), np.asarray(points.y)
 
-    if len(teren) == 0 or len(woda) == 0:
-        st.warning(f"⚠️ No valid class 2 or 9 points found in {os.path.basename(las_path)}")
-        return
+            for cls in (2, 9):
+                sel = classification == cls
+                if not np.any(sel):
+                    continue
+                xs, ys = x[sel], y[sel]
+                ranges[cls][0] = min(ranges[cls][0], xs.min())
+                ranges[cls][1] = max(ranges[cls][1], xs.max())
+                rank = seen[cls] + np.arange(len(xs))
+                seen[cls] += len(xs)
 
-    line = detect_edge_line(teren[::2], resolution=1.0, mode=mode)
+                plot_keep = rank % plot_stride == 0
+                samples[cls].append(np.column_stack((xs[plot_keep], ys[plot_keep])))
 
-    xmin = max(teren[:, 0].min(), woda[:, 0].min())
-    xmax = min(teren[:, 0].max(), woda[:, 0].max())
-    line = LineString([pt for pt in line.coords if xmin <= pt[0] <= xmax])
+                if cls == 2:
+                    keep = rank % 2 == 0
+                    candidates = np.vstack((edge_points, np.column_stack((xs[keep], ys[keep]))))
+                    edge_points = edge_points_per_bin(candidates, resolution=resolution, mode=mode)
 
-    feature = geojson.Feature(geometry=geojson.LineString(list(line.coords)), properties={"source": "scanline"})
-    feature_collection = geojson.FeatureCollection(
-        [feature],
-        crs={"type": "name", "properties": {"name": f"EPSG:{epsg}"}}
-    )
+    if seen[2] == 0 or seen[9] == 0:
+        return None
 
-    base_name = os.path.splitext(os.path.basename(las_path))[0]
-    geojson_path = os.path.join(output_path, base_name + ".geojson")
-    with open(geojson_path, "w") as f:
-        geojson.dump(feature_collection, f)
+    return edge_points, ranges[2], ranges[9], np.vstack(samples[2]), np.vstack(samples[9])
+
+
+def detect_las_shoreline(las_path, output_path, epsg, export_shp=False, mode='upper', streaming=False, chunk_size=STREAM_CHUNK_SIZE, keep_plot_data=False, read_once=False):
+    # Pure processing routine without Streamlit calls, safe to run in worker processes.
+    # Returns a result record; problems are reported in its "warning" / "error" fields.
+    # Batches read each file once (read_once=True) and do not build column stores for it.
+    start = time.perf_counter()
+    record = {"file": os.path.basename(las_path), "output": None, "vertices": 0, "time_s": None, "warning": None, "error": None}
+
+    try:
+        if streaming:
+            scan = stream_classified_las(las_path, mode=mode, chunk_size=chunk_size)
+            if scan is None:
+                record["warning"] = f"No valid class 2 or 9 points found in {record['file']}"
+                return record
+            edge_points, teren_range, woda_range, teren_plot, woda_plot = scan
+            line = LineString(edge_points)
+        else:
+            read = read_las_once if read_once else load_las
+            las = read(las_path, ("x", "y", "classification"))
+            x, y = las["x"], las["y"]
+            classification = las["classification"]
+
+            teren = np.column_stack((x[classification == 2], y[classification == 2]))
+            woda = np.column_stack((x[classification == 9], y[classification == 9]))
+
+            if len(teren) == 0 or len(woda) == 0:
+                record["warning"] = f"No valid class 2 or 9 points found in {record['file']}"
+                return record
+
+            line = detect_edge_line(teren[::2], resolution=1.0, mode=mode)
+            teren_range = (teren[:, 0].min(), teren[:, 0].max())
+            woda_range = (woda[:, 0].min(), woda[:, 0].max())
+            teren_plot, woda_plot = teren[::10], woda[::10]
+
+        xmin = max(teren_range[0], woda_range[0])
+        xmax = min(teren_range[1], woda_range[1])
+        line = LineString([pt for pt in line.coords if xmin <= pt[0] <= xmax])
+
+        feature = geojson.Feature(geometry=geojson.LineString(list(line.coords)), properties={"source": "scanline"})
+        feature_collection = geojson.FeatureCollection(
+            [feature],
+            crs={"type": "name", "properties": {"name": f"EPSG:{epsg}"}}
+        )
 
-    if export_shp:
-        shp_path = os.path.join(output_path, base_name)
-        save_shapefile(line, shp_path, epsg)
+        base_name = os.path.splitext(os.path.basename(las_path))[0]
+        geojson_path = os.path.join(output_path, base_name + ".geojson")
+        with open(geojson_path, "w") as f:
+            geojson.dump(feature_collection, f)
+
+        if export_shp:
+            shp_path = os.path.join(output_path, base_name)
+            save_shapefile(line, shp_path, epsg)
+
+        record["output"] = geojson_path
+        record["vertices"] = len(line.coords)
+        if keep_plot_data:
+            record["plot_data"] = (line, teren_plot, woda_plot)
+    except Exception as e:
+        record["error"] = f"Error processing {record['file']}: {e}"
+    finally:
+        record["time_s"] = round(time.perf_counter() - start, 2)
+
+    return record
+
+
+def process_las_file(las_path, output_path, epsg, plot=False, export_shp=False, mode='upper', streaming=False, chunk_size=STREAM_CHUNK_SIZE):
+    record = detect_las_shoreline(las_path, output_path, epsg, export_shp=export_shp, mode=mode, streaming=streaming, chunk_size=chunk_size, keep_plot_data=plot)
+    if record["error"]:
+        st.error(f"❌ {record['error']}")
+        return
+    if record["warning"]:
+        st.warning(f"⚠️ {record['warning']}")
+        return
+    register_shoreline(record["output"], "scanline", las_path)
 
     if plot:
+        line, teren_plot, woda_plot = record["plot_data"]
+        base_name = os.path.splitext(os.path.basename(las_path))[0]
+
         fig, ax = plt.subplots(figsize=(10, 8))
-        ax.scatter(*teren[::10].T, s=5, c='wheat', label='Ground')
-        ax.scatter(*woda[::10].T, s=5, c='lightskyblue', label='Water')
+        ax.scatter(*teren_plot.T, s=5, c='wheat', label='Ground')
+        ax.scatter(*woda_plot.T, s=5, c='lightskyblue', label='Water')
         ax.plot(*line.xy, 'r-', linewidth=2, label='Shoreline')
         ax.legend()
         ax.set_title(f"Shoreline: {os.path.basename(las_path)}")
@@ -97,30 +172,269 @@ def process_las_file(las_path, output_path, epsg, plot=False, export_shp=False,
         fig.savefig(os.path.join(png_dir, base_name + ".png"), dpi=300)
 
 
+def detect_batch_parallel(las_files, output_path, epsg, workers, **options):
+    # Yields one result record per file, in order of completion
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(detect_las_shoreline, path, output_path, epsg, **options) for path in las_files]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def build_tile_index(las_files):
+    # Tile extents from LAS headers only, no points are read
+    tiles = []
+    for path in las_files:
+        with laspy.open(path) as reader:
+            (xmin, ymin), (xmax, ymax) = reader.header.mins[:2], reader.header.maxs[:2]
+        tiles.append({"path": path, "bounds": (xmin, ymin, xmax, ymax)})
+    return tiles, STRtree([box(*tile["bounds"]) for tile in tiles])
+
+
+def group_adjacent_tiles(tiles, tree, buffer=MOSAIC_BUFFER):
+    # Tiles whose extents are closer than the buffer form one continuous stretch of coast
+    rows, cols = [], []
+    for i, tile in enumerate(tiles):
+        neighbours = tree.query(box(*tile["bounds"]).buffer(buffer), predicate="intersects")
+        rows.extend([i] * len(neighbours))
+        cols.extend(neighbours)
+    adjacency = coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(tiles), len(tiles)))
+    _, labels = connected_components(adjacency, directed=False)
+    return labels
+
+
+def reduce_cells(points, resolution=1.0, mode='upper'):
+    # One point per resolution-sized cell, the one with the highest (mode='upper') or lowest y.
+    # Cells share the x-bins of edge_points_per_bin, so per-bin extremes are preserved.
+    if len(points) == 0:
+        return points
+    cells = np.round(points / resolution).astype(np.int64)
+    order = np.lexsort((-points[:, 1] if mode == 'upper' else points[:, 1], cells[:, 1], cells[:, 0]))
+    cells = cells[order]
+    first = np.r_[True, np.any(cells[1:] != cells[:-1], axis=1)]
+    return points[order][first]
+
+
+def scan_tile(las_path, bounds, mode='upper', resolution=1.0, chunk_size=STREAM_CHUNK_SIZE, buffer=MOSAIC_BUFFER):
+    # One streamed pass over a tile: per-bin ground extremes and class 2/9 x-ranges of its own
+    # points, plus the cell-reduced ground and water points within the buffer of its border,
+    # which the neighbouring tiles use as context. Tiles with only one class are kept.
+    xmin, ymin, xmax, ymax = bounds
+    edge_points = np.empty((0, 2))
+    ranges = {2: [np.inf, -np.inf], 9: [np.inf, -np.inf]}
+    border = {2: np.empty((0, 2)), 9: np.empty((0, 2))}
+
+    with laspy.open(las_path) as reader:
+        for points in reader.chunk_iterator(int(chunk_size)):
+            classification = np.asarray(points.classification)
+            x, y = np.asarray(points.x), np.asarray(points.y)
+
+            for cls in (2, 9):
+                sel = classification == cls
+                if not np.any(sel):
+                    continue
+                xy = np.column_stack((x[sel], y[sel]))
+                ranges[cls][0] = min(ranges[cls][0], xy[:, 0].min())
+                ranges[cls][1] = max(ranges[cls][1], xy[:, 0].max())
+
+                near = (
+                    (xy[:, 0] < xmin + buffer) | (xy[:, 0] > xmax - buffer) |
+                    (xy[:, 1] < ymin + buffer) | (xy[:, 1] > ymax - buffer)
+                )
+                border[cls] = reduce_cells(np.vstack((border[cls], xy[near])), resolution, mode)
+                if cls == 2:
+                    edge_points = edge_points_per_bin(np.vstack((edge_points, xy)), resolution=resolution, mode=mode)
+
+    if np.isinf(ranges[2][0]) and np.isinf(ranges[9][0]):
+        return None
+    return {"bounds": bounds, "edge_points": edge_points, "ranges": ranges, "border": border}
+
+
+def split_runs(edge_points, resolution=1.0):
+    # Edge points of consecutive x-bins form one run; a skipped bin starts a new one
+    bins = np.round(edge_points[:, 0] / resolution)
+    gaps = np.flatnonzero(np.diff(bins) > 1) + 1
+    return [run for run in np.split(edge_points, gaps) if len(run)]
+
+
+def tile_runs(scan, neighbours, mode='upper', resolution=1.0, buffer=MOSAIC_BUFFER):
+    # Shoreline pieces owned by one tile: its own candidates plus the neighbours' border points
+    # within the buffer are reduced per bin as if they were one cloud, clipped like a single
+    # file to the x-range where ground and water overlap (over the tile and its neighbours,
+    # since the water facing a tile edge can sit just across the seam), and only the points
+    # inside the tile itself are kept, so every bin belongs to exactly one tile
+    xmin, ymin, xmax, ymax = scan["bounds"]
+
+    def in_reach(points):
+        return points[
+            (points[:, 0] >= xmin - buffer) & (points[:, 0] <= xmax + buffer) &
+            (points[:, 1] >= ymin - buffer) & (points[:, 1] <= ymax + buffer)
+        ]
+
+    ground = [scan["edge_points"]] + [in_reach(n["border"][2]) for n in neighbours]
+    ground_range = [scan["ranges"][2][0], scan["ranges"][2][1]]
+    water_range = [scan["ranges"][9][0], scan["ranges"][9][1]]
+    for n in neighbours:
+        for cls, limits in [(2, ground_range), (9, water_range)]:
+            limits[0] = min(limits[0], n["ranges"][cls][0])
+            limits[1] = max(limits[1], n["ranges"][cls][1])
+
+    edge_points = edge_points_per_bin(np.vstack(ground), resolution=resolution, mode=mode)
+    x, y = edge_points[:, 0], edge_points[:, 1]
+    keep = (
+        (x >= max(ground_range[0], water_range[0])) & (x <= min(ground_range[1], water_range[1])) &
+        (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+    )
+
+    # A sparse neighbour can leave a bin empty right across the seam, which would turn this
+    # tile's edge row into a false shoreline: ground beyond the edge in the adjacent bins
+    # also means the coast is not in this tile
+    beyond = np.vstack(ground[1:] + [np.empty((0, 2))])
+    beyond = beyond[beyond[:, 1] > ymax] if mode == 'upper' else beyond[beyond[:, 1] < ymin]
+    covered = np.unique(np.round(beyond[:, 0] / resolution).astype(np.int64))
+    covered = np.concatenate((covered - 1, covered, covered + 1))
+    keep &= ~np.isin(np.round(x / resolution).astype(np.int64), covered)
+
+    return split_runs(edge_points[keep], resolution)
+
+
+def join_runs(runs, max_gap):
+    # Chains runs end to end: the two closest free ends of different chains are joined
+    # repeatedly, as long as they are at most max_gap apart in x (seams cut the coast
+    # between neighbouring bins, at any height)
+    chains = [np.asarray(run) for run in runs]
+    while len(chains) > 1:
+        ends = np.array([[chain[0], chain[-1]] for chain in chains]).reshape(-1, 2)
+        owner = np.repeat(np.arange(len(chains)), 2)
+        dist = np.hypot(ends[:, None, 0] - ends[None, :, 0], ends[:, None, 1] - ends[None, :, 1])
+        dist[(owner[:, None] == owner[None, :]) | (np.abs(ends[:, None, 0] - ends[None, :, 0]) > max_gap)] = np.inf
+        a, b = np.unravel_index(np.argmin(dist), dist.shape)
+        if np.isinf(dist[a, b]):
+            break
+
+        first = chains[owner[a]] if a % 2 == 1 else chains[owner[a]][::-1]
+        second = chains[owner[b]] if b % 2 == 0 else chains[owner[b]][::-1]
+        if dist[a, b] == 0:
+            second = second[1:]
+        chains = [c for i, c in enumerate(chains) if i not in (owner[a], owner[b])] + [np.vstack((first, second))]
+    return [LineString(chain) for chain in chains if len(chain) > 1]
+
+
+def detect_mosaic_shoreline(las_files, output_file, epsg, workers=1, mode='upper', chunk_size=STREAM_CHUNK_SIZE, buffer=MOSAIC_BUFFER, progress=None):
+    tiles, tree = build_tile_index(las_files)
+    labels = group_adjacent_tiles(tiles, tree, buffer)
+    resolution = 1.0
+
+    scans = {}
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(scan_tile, tile["path"], tile["bounds"], mode, resolution, chunk_size, buffer): i
+                for i, tile in enumerate(tiles)
+            }
+            for future in as_completed(futures):
+                scans[futures[future]] = future.result()
+                if progress:
+                    progress(len(scans) / len(tiles))
+    else:
+        for i, tile in enumerate(tiles):
+            scans[i] = scan_tile(tile["path"], tile["bounds"], mode, resolution, chunk_size, buffer)
+            if progress:
+                progress(len(scans) / len(tiles))
+
+    # Each tile's pieces are extracted from its own points and the neighbours' border points,
+    # then joined at the seams within every stretch of adjacent tiles
+    lines = []
+    for label in np.unique(labels):
+        runs = []
+        for i in np.flatnonzero(labels == label):
+            if scans[i] is None:
+                continue
+            nearby = tree.query(box(*tiles[i]["bounds"]).buffer(buffer), predicate="intersects")
+            neighbours = [scans[j] for j in nearby if j != i and scans[j] is not None]
+            runs.extend(tile_runs(scans[i], neighbours, mode=mode, resolution=resolution, buffer=buffer))
+        lines.extend(join_runs(runs, max_gap=buffer + resolution))
+    lines.sort(key=lambda line: line.length, reverse=True)
+
+    features = [
+        geojson.Feature(geometry=geojson.LineString(list(line.coords)), properties={"source": "scanline_mosaic"})
+        for line in lines
+    ]
+    feature_collection = geojson.FeatureCollection(
+        features,
+        crs={"type": "name", "properties": {"name": f"EPSG:{epsg}"}}
+    )
+    with open(output_file, "w") as f:
+        geojson.dump(feature_collection, f)
+
+    return tiles, lines
+
+
 def run():
     st.subheader("Detection from classified .las")
     st.markdown("This step detects the shoreline based on LiDAR file in .las format with a classified point cloud without intensity values.")
 
-    mode = st.radio("Select processing mode:", ["Single file", "Batch folder"])
+    mode = st.radio("Select processing mode:", ["Single file", "Batch folder", "Tile mosaic"])
     epsg = st.text_input("EPSG code for output CRS", "2180")
     export_shp = st.checkbox("Export to SHP (default geojson)")
     edge_mode = st.selectbox("Coastline edge mode", ["upper", "lower"])
+    streaming = st.checkbox("Streaming mode (read in chunks, for very large ALS tiles)", value=False)
+    chunk_size = st.number_input("Chunk size [points]", min_value=100_000, value=STREAM_CHUNK_SIZE, step=1_000_000, disabled=not streaming)
 
     if mode == "Single file":
         input_dir = "input/las_class"
-        available_files = glob.glob(os.path.join(input_dir, "*.las"))
-        file_names = [os.path.basename(f) for f in available_files]
-        selected_file = st.selectbox("Select LAS file", file_names)
+        selected_file = select_las_file("Select LAS file", input_dir)
         output_dir = st.text_input("Output directory", "output/")
 
         if st.button("Run detection"):
             os.makedirs(output_dir, exist_ok=True)
             full_path = os.path.join(input_dir, selected_file)
-            process_las_file(full_path, output_dir, epsg, plot=True, export_shp=export_shp, mode=edge_mode)
+            process_las_file(full_path, output_dir, epsg, plot=True, export_shp=export_shp, mode=edge_mode, streaming=streaming, chunk_size=chunk_size)
+
+    elif mode == "Tile mosaic":
+        st.markdown("Adjacent ALS tiles are processed in parallel; each tile's shoreline is extracted with its neighbours' border points and the pieces are joined at the seams.")
+        input_dir = st.text_input("Input folder", "input/las_class")
+        output_file = st.text_input("Output GeoJSON", "output/als_mosaic.geojson")
+        workers = st.number_input("Parallel workers", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1, step=1)
+        buffer = st.number_input("Tile adjacency buffer [m]", min_value=0.0, value=MOSAIC_BUFFER, step=1.0)
+
+        if st.button("Run mosaic detection"):
+            las_files = glob.glob(os.path.join(input_dir, "*.las"))
+            if not las_files:
+                st.warning("No LAS files found in the input folder.")
+                return
+            os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+            progress = st.progress(0)
+            start = time.perf_counter()
+            tiles, lines = detect_mosaic_shoreline(
+                las_files, output_file, epsg, workers=min(int(workers), len(las_files)), mode=edge_mode,
+                chunk_size=chunk_size, buffer=buffer, progress=progress.progress
+            )
+
+            if not lines:
+                st.warning("⚠️ No shoreline found in the selected tiles.")
+                return
+            register_shoreline(output_file, "scanline", ";".join(sorted(tile["path"] for tile in tiles)))
+
+            fig, ax = plt.subplots(figsize=(10, 8))
+            for tile in tiles:
+                xmin, ymin, xmax, ymax = tile["bounds"]
+                ax.add_patch(plt.Rectangle((xmin, ymin), xmax - xmin, ymax - ymin, fill=False, edgecolor='gray', linewidth=0.5))
+            for line in lines:
+                ax.plot(*line.xy, 'r-', linewidth=2)
+            ax.set_title(f"Shoreline mosaic: {len(tiles)} tiles")
+            ax.set_xlabel("X")
+            ax.set_ylabel("Y")
+            ax.set_aspect("equal")
+            fig.tight_layout()
+            st.pyplot(fig)
+
+            st.success(f"✅ Mosaic of {len(tiles)} tiles ({len(lines)} shoreline segment(s)) saved to {output_file} in {time.perf_counter() - start:.1f} s.")
 
     else:  # Batch mode
         input_dir = st.text_input("Input folder", "input/las_class")
         output_dir = st.text_input("Output folder", "output/")
+        workers = st.number_input("Parallel workers", min_value=1, max_value=os.cpu_count() or 1, value=os.cpu_count() or 1, step=1)
 
         if st.button("Run batch detection"):
             os.makedirs(output_dir, exist_ok=True)
@@ -128,8 +442,23 @@ def run():
             progress = st.progress(0)
             total = len(las_files)
 
-            for i, path in enumerate(las_files):
-                process_las_file(path, output_dir, epsg, plot=False, export_shp=export_shp, mode=edge_mode)
-                progress.progress((i + 1) / total)
+            options = dict(export_shp=export_shp, mode=edge_mode, streaming=streaming, chunk_size=chunk_size, read_once=True)
+            workers = min(int(workers), max(total, 1))
+            if workers > 1:
+                results = detect_batch_parallel(las_files, output_dir, epsg, workers, **options)
+            else:
+                results = (detect_las_shoreline(path, output_dir, epsg, **options) for path in las_files)
+
+            records = []
+            for record in results:
+                records.append(record)
+                if record["error"]:
+                    st.error(f"❌ {record['error']}")
+                elif record["warning"]:
+                    st.warning(f"⚠️ {record['warning']}")
+                else:
+                    register_shoreline(record["output"], "scanline", os.path.join(input_dir, record["file"]))
+                progress.progress(len(records) / total)
 
+            st.dataframe(records)
             st.success(f"✅ Processed {total} LAS files.")
@@ -1,7 +1,5 @@
 import streamlit as st
 import os
-import glob
-import laspy
 import numpy as np
 import matplotlib.pyplot as plt
 from shapely.geometry import LineString, mapping
@@ -9,32 +7,22 @@ import geojson
 from fiona import collection
 from fiona.crs import from_epsg
 from scipy.ndimage import gaussian_filter1d
+from matplotlib.colors import ListedColormap
+from matplotlib.patches import Patch
+from tools.raster import PointGrid
+from tools.las_cache import load_las
+from tools.edge_line import edge_points_per_bin
+from tools.las_catalog import select_las_file
+from tools.shoreline_catalog import register_shoreline
+from tools.point_filter import filter_mask
+from tools.color_cube import load_color_cube, COLOR_STEP, Z_STEP
+
+# The coverage raster never needs more cells than the figure has pixels
+MAX_COVERAGE_CELLS_PER_AXIS = 2000
 
 
 def detect_edge_line(points, resolution=1.0, mode='upper', smoothing=5):
-    x, y = points[:, 0], points[:, 1]
-    bins = np.round(x / resolution) * resolution
-    idx_sort = np.argsort(x)
-    x_sorted = x[idx_sort]
-    y_sorted = y[idx_sort]
-    bins_sorted = bins[idx_sort]
-
-    unique_bins = np.unique(bins_sorted)
-    edge_points = []
-
-    for ub in unique_bins:
-        bin_mask = bins_sorted == ub
-        if not np.any(bin_mask):
-            continue
-        ys = y_sorted[bin_mask]
-        xs = x_sorted[bin_mask]
-        if mode == 'upper':
-            i = np.argmax(ys)
-        else:
-            i = np.argmin(ys)
-        edge_points.append((xs[i], ys[i]))
-
-    edge_points = np.array(edge_points)
+    edge_points = edge_points_per_bin(points, resolution=resolution, mode=mode)
 
     # Remove sudden jumps (outliers)
     if len(edge_points) > 5:
@@ -49,6 +37,20 @@ def detect_edge_line(points, resolution=1.0, mode='upper', smoothing=5):
     return LineString(edge_points)
 
 
+def plot_filter_coverage(ax, x, y, mask, cell_size):
+    # Rasterised instead of scattering subsampled points: one binning pass, cost independent of the point count
+    width, height = x.max() - x.min(), y.max() - y.min()
+    cell_size = max(cell_size, width / MAX_COVERAGE_CELLS_PER_AXIS, height / MAX_COVERAGE_CELLS_PER_AXIS)
+    nxb = max(1, int(width / cell_size))
+    nyb = max(1, int(height / cell_size))
+    grid = PointGrid(x, y, bins=[nxb, nyb])
+    coverage = (grid.count() > 0).astype(np.uint8)
+    coverage[grid.count(mask) > 0] = 2
+    cmap = ListedColormap(['white', 'lightgray', 'wheat'])
+    ax.imshow(coverage.T, extent=grid.extent, origin='lower', cmap=cmap, vmin=0, vmax=2, interpolation='nearest')
+    return [Patch(color='lightgray', label='All points'), Patch(color='wheat', label='Filtered points')]
+
+
 def save_geojson(line, output_path, epsg):
     feature = geojson.Feature(geometry=geojson.LineString(list(line.coords)), properties={"source": "rgb"})
     feature_collection = geojson.FeatureCollection(
@@ -64,8 +66,10 @@ def run():
     input_dir = "input/las_geoid"
     output_dir = st.text_input("Output folder", "output/")
     
-    files = glob.glob(os.path.join(input_dir, "*.las"))
-    selected_file = st.selectbox("Select LAS file", [os.path.basename(f) for f in files])
+    selected_file = select_las_file("Select LAS file", input_dir, require_rgb=True)
+    if selected_file is None:
+        st.warning("No LAS files with RGB values found in input/las_geoid.")
+        return
     
     epsg = st.text_input("EPSG code", "2180")
     edge_mode = st.selectbox("Edge mode", ["upper", "lower"])
@@ -96,65 +100,55 @@ def run():
     if st.button("Preview filter"):
         st.markdown("### Color space preview (Red vs Green / Blue)")
         full_path = os.path.join(input_dir, selected_file)
-        las = laspy.read(full_path)
-        x, y, z = las.x, las.y, las.z
-        r, g, b = las.red, las.green, las.blue
-
-        mask = (
-            (r >= red_min) & (r <= red_max) &
-            (g >= green_min) & (g <= green_max) &
-            (b >= blue_min) & (b <= blue_max) &
-            (z >= z_min) & (z <= z_max)
-        )
+        # Built on the first preview of a file; later previews do not touch the points
+        cube = load_color_cube(full_path)
+        if cube is None:
+            st.error("Selected LAS file has no RGB values.")
+            return
+        ranges = dict(red=(red_min, red_max), green=(green_min, green_max), blue=(blue_min, blue_max), z=(z_min, z_max))
 
         fig, ax = plt.subplots(figsize=(10, 6))
-        ax.scatter(x[::50], y[::50], c='lightgray', s=20, marker='s', label='All points')
-        ax.scatter(x[mask][::10], y[mask][::10], c='wheat', s=20, marker='s', label='Filtered points')
-        ax.legend()
+        cmap = ListedColormap(['white', 'lightgray', 'wheat'])
+        ax.imshow(cube.coverage(**ranges).T, extent=cube.extent, origin='lower', cmap=cmap, vmin=0, vmax=2, interpolation='nearest')
+        ax.legend(handles=[Patch(color='lightgray', label='All points'), Patch(color='wheat', label='Filtered points')])
         ax.set_title("Preview of RGB-Z filter")
         st.pyplot(fig)
 
         st.markdown("### Histograms of RGB values (with Z filter)")
+        edges, histograms = cube.channel_histograms((z_min, z_max))
         fig_hist, axs_hist = plt.subplots(3, 1, figsize=(10, 6))
-        r_zf = r[(z >= z_min) & (z <= z_max)]
-        g_zf = g[(z >= z_min) & (z <= z_max)]
-        b_zf = b[(z >= z_min) & (z <= z_max)]
-
-        axs_hist[0].hist(r_zf[::20], bins=100, color='red', alpha=0.6)
-        axs_hist[0].axvline(red_min, color='black', linestyle='--', label=f"Min: {red_min}")
-        axs_hist[0].axvline(red_max, color='black', linestyle='--', label=f"Max: {red_max}")
-        axs_hist[0].set_title("Red channel")
-        axs_hist[0].legend()
-
-        axs_hist[1].hist(g_zf[::20], bins=100, color='green', alpha=0.6)
-        axs_hist[1].axvline(green_min, color='black', linestyle='--', label=f"Min: {green_min}")
-        axs_hist[1].axvline(green_max, color='black', linestyle='--', label=f"Max: {green_max}")
-        axs_hist[1].set_title("Green channel")
-        axs_hist[1].legend()
-
-        axs_hist[2].hist(b_zf[::20], bins=100, color='blue', alpha=0.6)
-        axs_hist[2].axvline(blue_min, color='black', linestyle='--', label=f"Min: {blue_min}")
-        axs_hist[2].axvline(blue_max, color='black', linestyle='--', label=f"Max: {blue_max}")
-        axs_hist[2].set_title("Blue channel")
-        axs_hist[2].legend()
+        channels = [
+            ("red", "Red channel", red_min, red_max),
+            ("green", "Green channel", green_min, green_max),
+            ("blue", "Blue channel", blue_min, blue_max),
+        ]
+        for ax_hist, (color, title, low, high) in zip(axs_hist, channels):
+            ax_hist.stairs(histograms[color], edges, fill=True, color=color, alpha=0.6)
+            ax_hist.axvline(low, color='black', linestyle='--', label=f"Min: {low}")
+            ax_hist.axvline(high, color='black', linestyle='--', label=f"Max: {high}")
+            ax_hist.set_title(title)
+            ax_hist.legend()
 
         fig_hist.tight_layout()
         st.pyplot(fig_hist)
 
-        st.info(f"Points in filter range: {np.sum(mask)} / {len(z)}")
+        st.info(f"Points in filter range: ≈{cube.count(**ranges):.0f} / {cube.total}")
+        st.caption(f"Preview computed from colour bins of {COLOR_STEP} and height bins of {Z_STEP} m; detection uses the exact values.")
 
     if st.button("Run detection"):
         full_path = os.path.join(input_dir, selected_file)
-        las = laspy.read(full_path)
-        x, y, z = las.x, las.y, las.z
-        r, g, b = las.red, las.green, las.blue
+        las = load_las(full_path, ("x", "y", "z", "red", "green", "blue"))
+        if "red" not in las:
+            st.error("Selected LAS file has no RGB values.")
+            return
+        x, y = las["x"], las["y"]
 
-        mask = (
-            (r >= red_min) & (r <= red_max) &
-            (g >= green_min) & (g <= green_max) &
-            (b >= blue_min) & (b <= blue_max) &
-            (z >= z_min) & (z <= z_max)
-        )
+        mask = filter_mask(las, [
+            ("red", ">=", red_min), ("red", "<=", red_max),
+            ("green", ">=", green_min), ("green", "<=", green_max),
+            ("blue", ">=", blue_min), ("blue", "<=", blue_max),
+            ("z", ">=", z_min), ("z", "<=", z_max),
+        ])
 
         points = np.column_stack((x[mask], y[mask]))
         if len(points) == 0:
@@ -164,10 +158,9 @@ def run():
         line = detect_edge_line(points[::2], resolution=resolution, mode=edge_mode, smoothing=smoothing)
 
         fig, ax = plt.subplots(figsize=(10, 6))
-        ax.scatter(x[::50], y[::50], c='lightgray', s=20, marker='s', label='All points')
-        ax.scatter(points[::10, 0], points[::10, 1], c='wheat', s=20, marker='s', label='Filtered')
-        ax.plot(*line.xy, 'r-', linewidth=2, label='Detected shoreline')
-        ax.legend()
+        handles = plot_filter_coverage(ax, x, y, mask, resolution)
+        shoreline_plot, = ax.plot(*line.xy, 'r-', linewidth=2, label='Detected shoreline')
+        ax.legend(handles=handles + [shoreline_plot])
         ax.set_title("Shoreline detected from RGB")
         st.pyplot(fig)
 
@@ -175,5 +168,6 @@ def run():
         base_name = os.path.splitext(os.path.basename(selected_file))[0].replace("_geoid", "")
         out_path = os.path.join(output_dir, base_name + "_rgb.geojson")
         save_geojson(line, out_path, epsg)
+        register_shoreline(out_path, "rgb", full_path)
 
         st.success(f"Shoreline saved to: {out_path}")
@@ -0,0 +1,157 @@
+import numpy as np
+import shapely
+
+
+def interpolate_along_line(line, distances):
+    # Same arithmetic as GEOS line interpolation, but with one binary search per point
+    # instead of walking the line from its start for every point
+    if line.geom_type != "LineString":
+        return shapely.line_interpolate_point(line, distances)
+    coords = shapely.get_coordinates(line)
+    dx, dy = np.diff(coords[:, 0]), np.diff(coords[:, 1])
+    seg_len = np.sqrt(dx * dx + dy * dy)
+    seg_end = np.cumsum(seg_len)
+    seg_start = np.r_[0.0, seg_end[:-1]]
+
+    idx = np.searchsorted(seg_end, distances, side='right')
+    beyond = idx >= len(seg_len)
+    idx = np.minimum(idx, len(seg_len) - 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.clip((distances - seg_start[idx]) / seg_len[idx], 0.0, 1.0)
+    x = coords[idx, 0] + frac * dx[idx]
+    y = coords[idx, 1] + frac * dy[idx]
+    x[beyond], y[beyond] = coords[-1, 0], coords[-1, 1]
+    return shapely.points(x, y)
+
+
+def line_segments(line):
+    segments = []
+    for part in shapely.get_parts(line):
+        coords = shapely.get_coordinates(part)
+        segments.append(shapely.linestrings(np.stack([coords[:-1], coords[1:]], axis=1)))
+    return np.concatenate(segments)
+
+
+def distance_to_line(line, points):
+    # Nearest-segment search in an STRtree instead of scanning every vertex of the line
+    # for every point; the point-segment distances are the same as line.distance(point)
+    tree = shapely.STRtree(line_segments(line))
+    (point_idx, _), distances = tree.query_nearest(points, return_distance=True, all_matches=False)
+    result = np.empty(len(points))
+    result[point_idx] = distances
+    return result
+
+
+def cast_transects(baseline, spacing, length, smoothing=10.0):
+    # Shore-normal transects every `spacing` metres along the baseline, centred on it.
+    # The normal is taken across a `smoothing` window so jagged baselines give stable directions.
+    stations = np.arange(int(baseline.length // spacing) + 1) * spacing
+    before = shapely.get_coordinates(interpolate_along_line(baseline, np.clip(stations - smoothing / 2, 0, baseline.length)))
+    after = shapely.get_coordinates(interpolate_along_line(baseline, np.clip(stations + smoothing / 2, 0, baseline.length)))
+    origins = shapely.get_coordinates(interpolate_along_line(baseline, stations))
+
+    tangent = after - before
+    flat = ~np.any(tangent, axis=1)
+    if flat.any():
+        # Without a smoothing window the direction of the baseline segment at the station is used
+        segments = line_segments(baseline)
+        _, seg_idx = shapely.STRtree(segments).query_nearest(shapely.points(origins[flat]), all_matches=False)
+        seg_coords = shapely.get_coordinates(segments[seg_idx]).reshape(-1, 2, 2)
+        tangent[flat] = seg_coords[:, 1] - seg_coords[:, 0]
+    tangent /= np.linalg.norm(tangent, axis=1, keepdims=True)
+    normals = np.column_stack((-tangent[:, 1], tangent[:, 0]))
+
+    starts = origins - normals * length / 2
+    ends = origins + normals * length / 2
+    return stations, origins, normals, shapely.linestrings(np.stack([starts, ends], axis=1))
+
+
+def transect_positions(transects, origins, normals, length, shorelines):
+    # Signed position of every shoreline along every transect (positive along the normal),
+    # as a (transects x shorelines) array with NaN where a shoreline does not cross a transect.
+    # One STRtree over the segments of all shorelines gives the candidate pairs for all
+    # dates at once; where a shoreline crosses a transect several times the crossing
+    # nearest to the baseline is used.
+    segments = [line_segments(line) for line in shorelines]
+    owner = np.repeat(np.arange(len(shorelines)), [len(s) for s in segments])
+    segments = np.concatenate(segments)
+
+    tree = shapely.STRtree(segments)
+    t_idx, s_idx = tree.query(transects)
+
+    seg_coords = shapely.get_coordinates(segments).reshape(-1, 2, 2)
+    a = origins[t_idx] - normals[t_idx] * length / 2
+    r = normals[t_idx] * length
+    p = seg_coords[s_idx, 0]
+    s = seg_coords[s_idx, 1] - p
+
+    denom = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+    ap = p - a
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = (ap[:, 0] * s[:, 1] - ap[:, 1] * s[:, 0]) / denom
+        u = (ap[:, 0] * r[:, 1] - ap[:, 1] * r[:, 0]) / denom
+    hit = (denom != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+
+    result = np.full((len(transects), len(shorelines)), np.nan)
+    if not hit.any():
+        return result
+
+    positions = (t[hit] - 0.5) * length
+    t_idx, line_idx = t_idx[hit], owner[s_idx[hit]]
+
+    order = np.lexsort((np.abs(positions), line_idx, t_idx))
+    pair = t_idx[order] * len(shorelines) + line_idx[order]
+    first = np.r_[True, pair[1:] != pair[:-1]]
+    result[t_idx[order][first], line_idx[order][first]] = positions[order][first]
+    return result
+
+
+def envelope_stats(positions):
+    # Per-transect envelope (max - min position), mean and sample standard deviation over the dates
+    valid = ~np.isnan(positions)
+    n = valid.sum(axis=1)
+    filled = np.where(valid, positions, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=1) / n
+        var = np.where(valid, (positions - mean[:, None]) ** 2, 0.0).sum(axis=1) / (n - 1)
+    envelope = np.where(valid, positions, -np.inf).max(axis=1) - np.where(valid, positions, np.inf).min(axis=1)
+    return {
+        "n_dates": n,
+        "sce": np.where(n > 0, envelope, np.nan),
+        "mean_position": mean,
+        "std_position": np.where(n > 1, np.sqrt(var), np.nan),
+    }
+
+
+def shoreline_rates(positions, years):
+    # DSAS rate statistics for all transects at once from a (transects x dates) position array
+    # and the survey times in decimal years. NSM and EPR use the oldest and youngest crossing
+    # of each transect; LRR is the least-squares slope, solved from masked normal equations.
+    valid = ~np.isnan(positions)
+    n = valid.sum(axis=1)
+    t = np.where(valid, years, 0.0)
+    x = np.where(valid, positions, 0.0)
+
+    rows = np.arange(len(positions))
+    oldest = np.argmax(valid, axis=1)
+    youngest = positions.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    nsm = positions[rows, youngest] - positions[rows, oldest]
+    span = years[youngest] - years[oldest]
+
+    sum_t, sum_x = t.sum(axis=1), x.sum(axis=1)
+    sxx = (t * t).sum(axis=1) - sum_t ** 2 / np.maximum(n, 1)
+    sxy = (t * x).sum(axis=1) - sum_t * sum_x / np.maximum(n, 1)
+    syy = (x * x).sum(axis=1) - sum_x ** 2 / np.maximum(n, 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        epr = nsm / span
+        lrr = sxy / sxx
+        lr2 = sxy ** 2 / (sxx * syy)
+    enough = n >= 2
+    return {
+        "n_dates": n,
+        "nsm": np.where(enough, nsm, np.nan),
+        "epr": np.where(enough & (span > 0), epr, np.nan),
+        "lrr": np.where(enough & (sxx > 0), lrr, np.nan),
+        "lr2": np.where(enough & (sxx > 0) & (syy > 0), lr2, np.nan),
+    }